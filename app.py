@@ -1,9 +1,22 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from scraper import AmazonScraper
+from cache import DEFAULT_TTL
+from importer import CATALOG_COLUMNS, import_items, read_names
+from storage import PriceHistory, remove_items_from_csv
+from jobs import get_runner
+import html
 import time
 import os
 
+PRODUCTS_CSV = 'products.csv'
+FAILED_VALUES = ["Not found", "Error", ""]
+STATUS_FILTERS = {"All": None, "Priced": 'ok', "Not available": 'not_found', "Errors": 'error'}
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Selectboxes only ever list this many matches
+MAX_OPTIONS = 100
+
 # Set page config
 st.set_page_config(
     page_title="Amazon Price Tracker",
@@ -23,6 +36,92 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+def products_mtime(csv_file=PRODUCTS_CSV):
+    try:
+        return os.path.getmtime(csv_file)
+    except OSError:
+        return None
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_products(csv_file, mtime):
+    # mtime is part of the cache key, so the CSV is only read and formatted again after it changed
+    df = pd.read_csv(csv_file, dtype=str, keep_default_na=False)
+    for column in CATALOG_COLUMNS:
+        if column not in df.columns:
+            df[column] = ""
+
+    # Vectorized display columns for the whole catalog, computed once per file version
+    priced = pd.to_numeric(df['item_price'], errors='coerce').notna()
+    has_currency = (df['currency_symbol'] != "") & (df['currency'] != "")
+    df['Price'] = np.where(
+        priced & has_currency,
+        df['currency_symbol'] + df['item_price'] + " (" + df['currency'] + ")",
+        np.where(priced, df['item_price'], "Not available")
+    )
+    has_link = ~df['item_url'].isin(FAILED_VALUES)
+    df['Amazon Link'] = np.where(
+        has_link, '<a href="' + df['item_url'] + '" target="_blank">View on Amazon</a>', "Not available"
+    )
+    df['status'] = np.where(priced, 'ok', np.where(df['item_price'] == "Error", 'error', 'not_found'))
+    df['search_key'] = df['item_name'].str.lower()
+    return df
+
+def filter_products(df, query, status):
+    if query:
+        df = df[df['search_key'].str.contains(query.lower(), regex=False)]
+    if status:
+        df = df[df['status'] == status]
+    return df
+
+def show_page(df, page_size, page):
+    # Only the rows of the current page are turned into HTML
+    rows = df.iloc[(page - 1) * page_size:page * page_size][['item_name', 'Price', 'Amazon Link']].copy()
+    rows['item_name'] = rows['item_name'].map(html.escape)
+    st.write(rows.to_html(escape=False, index=False), unsafe_allow_html=True)
+
+def rows_to_refresh(df, region):
+    # Rows without a price, plus rows whose last observation in this region is older than the cache TTL
+    names = set(df.loc[df['status'] != 'ok', 'item_name'])
+    if os.path.exists("price_history.db"):
+        latest = PriceHistory("price_history.db").latest(region)
+        fresh = set(latest.loc[latest['observed_at'] >= time.time() - DEFAULT_TTL, 'item_name'])
+        names.update(set(df['item_name']) - fresh)
+    return names
+
+def pick_product(label, df, key):
+    # Search first, then choose among at most MAX_OPTIONS matches instead of the whole catalog
+    query = st.text_input(f"Search {label.lower()}", key=f"{key}_query")
+    matches = filter_products(df, query, None)['item_name'].head(MAX_OPTIONS).tolist()
+    if len(matches) == MAX_OPTIONS:
+        st.caption(f"Showing the first {MAX_OPTIONS} matches, refine the search to narrow them down.")
+    return st.selectbox(label, matches, key=key)
+
+def show_job_status(runner, region):
+    # Returns True while the latest job for the region is running and the page should keep polling
+    job = runner.latest(region)
+    if job is None:
+        return False
+    status = job.snapshot()
+
+    if status['status'] == 'running':
+        st.progress(status['progress'])
+        current = f" Last: {status['current_item']}" if status['current_item'] else ""
+        st.text(f"Updating {region} prices: {status['done']}/{status['total']} items ({status['failed']} failed).{current}")
+        if status['recent_results']:
+            partial = pd.DataFrame(status['recent_results'][-10:])
+            st.dataframe(partial[['item_name', 'item_price', 'currency']], use_container_width=True)
+        if st.button("⏹ Cancel Update"):
+            runner.cancel(status['id'])
+        return True
+
+    if status['status'] == 'completed':
+        st.success(f"✅ Prices updated successfully! ({status['done']} items, {status['failed']} not available)")
+    elif status['status'] == 'cancelled':
+        st.warning(f"Update cancelled after {status['done']} of {status['total']} items.")
+    elif status['status'] == 'failed':
+        st.error(f"❌ Error updating prices: {status['error']}")
+    return False
+
 def main():
     # Header
     st.title("🛍️ Amazon Price Tracker")
@@ -52,126 +151,111 @@ def main():
                 if new_products.strip():
                     # Split the input by newlines and remove empty lines
                     products_to_add = [p.strip() for p in new_products.split('\n') if p.strip()]
-                    
+
                     if products_to_add:
                         try:
-                            # Read existing products
-                            try:
-                                df = pd.read_csv('products.csv')
-                            except FileNotFoundError:
-                                df = pd.DataFrame(columns=['item_name', 'item_price', 'currency', 'currency_symbol', 'item_url'])
-                            
-                            # Add new products
-                            new_rows = pd.DataFrame({
-                                'item_name': products_to_add,
-                                'item_price': ['']*len(products_to_add),
-                                'currency': ['']*len(products_to_add),
-                                'currency_symbol': ['']*len(products_to_add),
-                                'item_url': ['']*len(products_to_add)
-                            })
-                            df = pd.concat([df, new_rows], ignore_index=True)
-                            
-                            # Remove duplicates
-                            df = df.drop_duplicates(subset=['item_name'], keep='first')
-                            
-                            # Save updated DataFrame
-                            df.to_csv('products.csv', index=False)
-                            st.success(f"Added {len(products_to_add)} new product(s)!")
-                            st.rerun()
+                            # Near-duplicates of tracked items (case, spacing, punctuation) are skipped
+                            stats = import_items([products_to_add], PRODUCTS_CSV)
+                            st.success(f"Added {stats['added']} new product(s)! ({stats['duplicates']} already tracked)")
+                            st.experimental_rerun()
                         except Exception as e:
                             st.error(f"An error occurred: {str(e)}")
                     else:
                         st.warning("Please enter at least one product.")
 
+            # Bulk import streams the file instead of loading it next to the catalog
+            uploaded = st.file_uploader(
+                "Or import a file", type=['csv', 'txt'],
+                help="CSV with an item_name column, or a text file with one product per line"
+            )
+            if uploaded is not None and st.button("Import File"):
+                try:
+                    stats = import_items(read_names(uploaded), PRODUCTS_CSV)
+                    st.success(
+                        f"Imported {stats['added']} of {stats['read']} product(s), "
+                        f"skipped {stats['duplicates']} duplicates."
+                    )
+                    st.experimental_rerun()
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
+
     # Main content
     try:
-        df = pd.read_csv('products.csv')
+        mtime = products_mtime()
+        if mtime is None:
+            raise FileNotFoundError(PRODUCTS_CSV)
+        df = load_products(PRODUCTS_CSV, mtime)
         if len(df) > 0:
+            runner = get_runner()
             if st.button("🔄 Update Prices"):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                scraper = AmazonScraper('products.csv', region=region)
-                
-                # Update prices with progress bar
-                for index, row in df.iterrows():
-                    status_text.text(f"Fetching price for {row['item_name']}...")
-                    progress = (index + 1) / len(df)
-                    progress_bar.progress(progress)
-                    time.sleep(0.1)  # Small delay for visual feedback
-                
-                success = scraper.update_prices()
-                if success:
-                    st.success("✅ Prices updated successfully!")
+                runner.submit(PRODUCTS_CSV, region)
+
+            # Every session watches the same background job for this region;
+            # a finished job changes the CSV's mtime, which reloads the cached data
+            job_running = show_job_status(runner, region)
+            df = load_products(PRODUCTS_CSV, products_mtime())
+
+            st.header("📊 Product Prices")
+
+            # Search, filter and paginate on the server; only one page is rendered
+            search_col, status_col, size_col = st.columns([3, 1, 1])
+            query = search_col.text_input("Search products", key="table_query")
+            status = status_col.selectbox("Show", list(STATUS_FILTERS), key="table_status")
+            page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=1, key="table_page_size")
+            filtered = filter_products(df, query, STATUS_FILTERS[status])
+
+            pages = max(1, -(-len(filtered) // page_size))
+            # Keyed by the filters so a new search starts again on page 1
+            page = st.number_input(
+                "Page", min_value=1, max_value=pages, value=1, step=1, key=f"table_page_{query}_{status}_{page_size}"
+            )
+            st.caption(f"{len(filtered)} of {len(df)} products, page {page} of {pages}")
+            show_page(filtered, page_size, page)
+
+            # Only rows that failed or went stale are scraped again
+            if st.button("🔄 Refresh Prices"):
+                names = rows_to_refresh(df, region)
+                if names:
+                    runner.submit(PRODUCTS_CSV, region, only=names)
+                    st.experimental_rerun()
                 else:
-                    st.error("❌ Error updating prices")
-                
-                # Clear progress
-                progress_bar.empty()
-                status_text.empty()
-                
-                # Reload the data
-                df = pd.read_csv('products.csv')
-            
-            # Display current products and prices
-            if os.path.exists("products.csv"):
-                df = pd.read_csv("products.csv")
-                if not df.empty:
-                    st.header("📊 Product Prices")
-                    
-                    def make_clickable(url):
-                        if pd.isna(url) or url in ["Not found", "Error", ""]:
-                            return "Not available"
-                        return f'<a href="{url}" target="_blank">View on Amazon</a>'
-
-                    def format_price(row):
-                        price = row['item_price']
-                        if pd.isna(price) or price in ["Not found", "Error", ""]:
-                            return "Not available"
-                        if pd.isna(row['currency_symbol']) or pd.isna(row['currency']):
-                            return str(price)
-                        return f"{row['currency_symbol']}{price} ({row['currency']})"
-                    
-                    # Create a copy of the dataframe for display
-                    display_df = df.copy()
-                    
-                    # Convert numeric columns to appropriate types
-                    display_df['item_price'] = pd.to_numeric(display_df['item_price'], errors='coerce')
-                    
-                    # Format the display columns
-                    display_df['Amazon Link'] = display_df['item_url'].apply(make_clickable)
-                    display_df['Price'] = display_df.apply(format_price, axis=1)
-                    
-                    # Display the dataframe with clickable links
-                    st.write(display_df[['item_name', 'Price', 'Amazon Link']].to_html(escape=False, index=False), unsafe_allow_html=True)
-                    
-                    if st.button("🔄 Refresh Prices"):
-                        with st.spinner("Updating prices..."):
-                            scraper = AmazonScraper("products.csv", region=region)
-                            success = scraper.scrape_prices()
-                            if success:
-                                st.success("✅ Prices updated successfully!")
-                                time.sleep(1)
-                                st.experimental_rerun()
-                            else:
-                                st.error("❌ Error updating prices. Please try again.")
-            
+                    st.info("All prices are fresh.")
+
+            # Price history for a single product
+            if os.path.exists("price_history.db"):
+                with st.expander("📈 Price History"):
+                    history_item = pick_product("Select product", df, "history_item")
+                    if history_item:
+                        history = PriceHistory("price_history.db").history(history_item, region=region)
+                        history = history[history['status'] == 'ok']
+                        if history.empty:
+                            st.info(f"No price history for {history_item} in {region} yet.")
+                        else:
+                            st.line_chart(history.set_index('observed_at')['price'])
+
             # Option to remove products
             st.markdown("### ⚙️ Manage Products")
-            product_to_remove = st.selectbox("Select product to remove", df['item_name'].tolist())
-            if st.button("Remove Selected Product"):
-                df = df[df['item_name'] != product_to_remove]
-                df.to_csv('products.csv', index=False)
+            product_to_remove = pick_product("Select product to remove", df, "remove_item")
+            if st.button("Remove Selected Product") and product_to_remove:
+                # Filters the file as it is now, under the catalog lock, so prices a job merged
+                # since this page was loaded are kept
+                remove_items_from_csv(PRODUCTS_CSV, [product_to_remove])
                 st.success(f"Removed {product_to_remove} from tracking list!")
-                st.rerun()
-        
+                st.experimental_rerun()
+
+            # Poll a running job only after the table and controls are rendered,
+            # so the catalog stays usable while the job runs
+            if job_running:
+                time.sleep(1)
+                st.experimental_rerun()
+
         else:
             st.info("👋 Welcome! Add some products to start tracking their prices.")
-            
+
     except FileNotFoundError:
         st.warning("No products file found. Add some products to get started!")
         # Create empty products.csv
-        pd.DataFrame(columns=['item_name', 'item_price', 'currency', 'currency_symbol', 'item_url']).to_csv('products.csv', index=False)
+        pd.DataFrame(columns=CATALOG_COLUMNS).to_csv(PRODUCTS_CSV, index=False)
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
 
@@ -0,0 +1,65 @@
+from storage import connect, execute, execute_in
+from cache import normalize_query
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS asins (
+    region TEXT NOT NULL,
+    query TEXT NOT NULL,
+    asin TEXT NOT NULL,
+    product_url TEXT,
+    resolved_at REAL NOT NULL,
+    PRIMARY KEY (region, query)
+);
+CREATE INDEX IF NOT EXISTS idx_asins_asin ON asins (asin);
+"""
+
+
+class AsinIndex:
+    def __init__(self, db_path='asin_index.db'):
+        self.db_path = db_path
+        connection = connect(self.db_path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def get(self, item_name, region):
+        rows = execute(
+            self.db_path,
+            "SELECT asin, product_url FROM asins WHERE region = ? AND query = ?",
+            (region, normalize_query(item_name))
+        )
+        if not rows:
+            return None
+        return {'asin': rows[0][0], 'product_url': rows[0][1]}
+
+    def get_many(self, item_names, region):
+        # ASINs for every known name, one query per batch
+        by_query = {}
+        for item_name in item_names:
+            by_query.setdefault(normalize_query(item_name), []).append(item_name)
+        rows = execute_in(
+            self.db_path,
+            "SELECT query, asin FROM asins WHERE region = ? AND query IN ({placeholders})",
+            by_query, (region,)
+        )
+        found = {}
+        for query, asin in rows:
+            for item_name in by_query[query]:
+                found[item_name] = asin
+        return found
+
+    def put(self, item_name, region, asin, product_url=None):
+        execute(
+            self.db_path,
+            "INSERT OR REPLACE INTO asins (region, query, asin, product_url, resolved_at) VALUES (?, ?, ?, ?, ?)",
+            (region, normalize_query(item_name), asin, product_url, time.time())
+        )
+
+    def invalidate(self, item_name, region):
+        execute(
+            self.db_path,
+            "DELETE FROM asins WHERE region = ? AND query = ?",
+            (region, normalize_query(item_name))
+        )
@@ -0,0 +1,256 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+sys.path.insert(0, ROOT)
+
+from blocking import CircuitBreaker  # noqa: E402
+from metrics import Metrics  # noqa: E402
+from scraper import ENGINES, FAILED_PRICES, AmazonScraper  # noqa: E402
+
+
+def load_manifest():
+    with open(os.path.join(PAGES_DIR, 'manifest.json'), encoding='utf-8') as manifest:
+        return json.load(manifest)
+
+
+class RecordedPages(BaseHTTPRequestHandler):
+    # Serves /<REGION>/s?k=<query> and /<REGION>/dp/<ASIN> from the recordings in pages/
+    manifest = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+
+        if len(parts) == 3 and parts[1] == 'dp':
+            page = self.manifest['product'].get(parts[0], {}).get(parts[2])
+            return self.send_page(page, 200)
+
+        if len(parts) == 2 and parts[1] == 's':
+            query = parse_qs(url.query).get('k', [''])[0]
+            for case in self.manifest['search']:
+                if case['region'] == parts[0] and case['query'] == query:
+                    return self.send_page(case['page'], case.get('status', 200))
+
+        self.send_page(None, 404)
+
+    def send_page(self, page, status):
+        if page is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        with open(os.path.join(PAGES_DIR, page), 'rb') as recording:
+            body = recording.read()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(manifest):
+    RecordedPages.manifest = manifest
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RecordedPages)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux and bytes on macOS; children covers Chrome once it has exited
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own + children, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def make_scraper(engine, port, workdir):
+    # Every store lives in a throwaway directory; the result cache is off so each pass really fetches
+    scraper = AmazonScraper(
+        os.path.join(workdir, 'products.csv'), region='US', engine=engine,
+        history_db=None, cache_db=None, journal_db=None,
+        asin_db=os.path.join(workdir, 'asin_index.db'),
+        rate_db=os.path.join(workdir, 'rate_limits.db'), rate=1000, burst=1000, metrics=Metrics()
+    )
+    scraper.base_urls = {region: f"http://127.0.0.1:{port}/{region}/s?k=" for region in scraper.base_urls}
+    scraper.base_url = scraper.base_urls['US']
+    scraper.backoff.base_delay = 0.05
+    return scraper
+
+
+def run_pass(scraper, cases):
+    samples = []
+    for case in cases:
+        started = time.perf_counter()
+        result = scraper.scrape_item(case['query'], case['region'])
+        elapsed = time.perf_counter() - started
+
+        # Cases are measured independently, a captcha case must not leave the breaker open for the next one
+        if scraper.breaker.is_open(case['region']):
+            scraper.breaker = CircuitBreaker(scraper.breaker.threshold, scraper.breaker.cooldown)
+
+        price = None if result['item_price'] in FAILED_PRICES else result['item_price']
+        samples.append({
+            'kind': case['kind'],
+            'region': case['region'],
+            'query': case['query'],
+            'seconds': elapsed,
+            'price': price,
+            'expected_price': case['expected_price'],
+            'correct': price == case['expected_price'],
+        })
+    return samples
+
+
+def refresh_outcomes(scraper):
+    # ASIN-index refreshes by outcome, over all regions
+    outcomes = {}
+    for counter in scraper.metrics.snapshot()['counters']:
+        if counter['name'] == 'asin_refreshes_total':
+            outcome = counter['labels']['outcome']
+            outcomes[outcome] = outcomes.get(outcome, 0) + counter['value']
+    return outcomes
+
+
+def check_refreshes(outcomes, cases, repeat):
+    # Every priced case must be refreshed from its product page; a 404 followed by a search
+    # would otherwise be reported as refresh latency
+    expected = sum(case['expected_price'] is not None for case in cases) * repeat
+    if outcomes.get('ok', 0) != expected or set(outcomes) - {'ok'}:
+        raise RuntimeError(f"Expected {expected} ASIN refreshes with outcome ok, got {outcomes}")
+
+
+def summarize(samples, elapsed):
+    latencies = [sample['seconds'] for sample in samples]
+    by_kind = {}
+    for sample in samples:
+        kind = by_kind.setdefault(sample['kind'], {'items': 0, 'correct': 0, 'seconds': []})
+        kind['items'] += 1
+        kind['correct'] += sample['correct']
+        kind['seconds'].append(sample['seconds'])
+
+    return {
+        'items': len(samples),
+        'items_per_sec': round(len(samples) / elapsed, 3) if elapsed else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+        },
+        'accuracy': round(sum(sample['correct'] for sample in samples) / len(samples), 3),
+        'by_kind': {
+            kind: {
+                'items': stats['items'],
+                'accuracy': round(stats['correct'] / stats['items'], 3),
+                'p50_ms': round(percentile(stats['seconds'], 50) * 1000, 2),
+            }
+            for kind, stats in by_kind.items()
+        },
+        'misses': [
+            {key: sample[key] for key in ('region', 'query', 'price', 'expected_price')}
+            for sample in samples if not sample['correct']
+        ][:20],
+    }
+
+
+def run_benchmark(engine='http', repeat=5):
+    manifest = load_manifest()
+    server = start_server(manifest)
+    port = server.server_address[1]
+    report = {'commit': git_commit(), 'engine': engine, 'repeat': repeat, 'timestamp': time.time()}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        open(os.path.join(workdir, 'products.csv'), 'w').write("item_name\n")
+        scraper = make_scraper(engine, port, workdir)
+        try:
+            # Chrome startup is measured on its own so it does not skew per-item latency
+            report['driver_startup_seconds'] = None
+            if scraper.browser is not None:
+                started = time.perf_counter()
+                scraper.browser.driver
+                report['driver_startup_seconds'] = round(time.perf_counter() - started, 3)
+
+            # First pass resolves items through search pages, later passes refresh through the ASIN index
+            for name in ('search', 'refresh'):
+                samples = []
+                scraper.metrics.reset()
+                started = time.perf_counter()
+                for _ in range(repeat if name == 'refresh' else 1):
+                    samples.extend(run_pass(scraper, manifest['search']))
+                report[name] = summarize(samples, time.perf_counter() - started)
+            report['refresh']['asin_refreshes'] = refresh_outcomes(scraper)
+            check_refreshes(report['refresh']['asin_refreshes'], manifest['search'], repeat)
+        finally:
+            scraper.close()
+            server.shutdown()
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def compare(report, baseline):
+    # Relative change of the headline numbers against an earlier report
+    lines = []
+    for name in ('search', 'refresh'):
+        for key, current, previous in (
+            ('items_per_sec', report[name]['items_per_sec'], baseline[name]['items_per_sec']),
+            ('p95_ms', report[name]['latency_ms']['p95'], baseline[name]['latency_ms']['p95']),
+            ('accuracy', report[name]['accuracy'], baseline[name]['accuracy']),
+        ):
+            change = f"{(current - previous) / previous:+.1%}" if previous else "n/a"
+            lines.append(f"{name}.{key}: {previous} -> {current} ({change})")
+    lines.append(f"peak_rss_mb: {baseline['peak_rss_mb']} -> {report['peak_rss_mb']}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline AmazonScraper benchmark on recorded pages")
+    parser.add_argument('--engine', default='http', choices=ENGINES, help="Page fetch engine to benchmark")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of refresh passes over the recordings")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    parser.add_argument('--compare', help="Earlier JSON report to compare against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    report = run_benchmark(engine=args.engine, repeat=args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            print(compare(report, json.load(baseline)), file=sys.stderr)
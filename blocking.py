@@ -0,0 +1,102 @@
+import logging
+import random
+import threading
+import time
+
+# Text that only appears on Amazon's captcha / robot check pages
+BLOCK_MARKERS = (
+    '/errors/validateCaptcha',
+    'Enter the characters you see below',
+    'To discuss automated access to Amazon data',
+    '<title>Robot Check</title>',
+)
+
+# Status codes Amazon uses when throttling or blocking a client
+BLOCK_STATUS_CODES = (403, 429, 503)
+
+
+class BlockedError(Exception):
+    def __init__(self, url, reason):
+        super().__init__(f"Blocked ({reason}) at {url}")
+        self.url = url
+        self.reason = reason
+
+
+def classify_page(page):
+    # Runs right after navigation, before any extraction work
+    if page.blocked:
+        return 'captcha'
+    if any(marker in page.html for marker in BLOCK_MARKERS):
+        return 'captcha'
+    if page.status_code in BLOCK_STATUS_CODES:
+        return 'blocked'
+    return 'ok'
+
+
+class DomainBackoff:
+    def __init__(self, base_delay=2.0, max_delay=120.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def delay(self, domain):
+        # Exponential backoff with full jitter
+        with self._lock:
+            failures = self._failures.get(domain, 0)
+        ceiling = min(self.max_delay, self.base_delay * (2 ** failures))
+        return random.uniform(0, ceiling)
+
+    def failure(self, domain):
+        with self._lock:
+            self._failures[domain] = self._failures.get(domain, 0) + 1
+
+    def success(self, domain):
+        with self._lock:
+            self._failures.pop(domain, None)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=3, cooldown=300):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._blocks = {}
+        self._open_until = {}
+        self._lock = threading.Lock()
+
+    def allow(self, region):
+        # Closed, or half-open once the cooldown has passed
+        with self._lock:
+            return time.time() >= self._open_until.get(region, 0)
+
+    def is_open(self, region):
+        return not self.allow(region)
+
+    def reopens_in(self, region):
+        # Seconds until the cooldown ends and requests are allowed again, 0 when closed
+        with self._lock:
+            return max(0.0, self._open_until.get(region, 0) - time.time())
+
+    def record_block(self, region):
+        # Returns True when this block trips the breaker. While it is open, blocks from requests
+        # that were already in flight are ignored; when half-open, the first block reopens it
+        with self._lock:
+            now = time.time()
+            open_until = self._open_until.get(region)
+            if open_until is not None and now < open_until:
+                return False
+            self._blocks[region] = self._blocks.get(region, 0) + 1
+            if open_until is not None or self._blocks[region] >= self.threshold:
+                self._open_until[region] = now + self.cooldown
+                self._blocks[region] = 0
+                logging.warning(f"Circuit open for {region}: pausing requests for {self.cooldown}s")
+                return True
+        return False
+
+    def record_success(self, region):
+        # Successes of requests started before the circuit opened do not close it
+        with self._lock:
+            if time.time() < self._open_until.get(region, 0):
+                return
+            self._blocks.pop(region, None)
+            self._open_until.pop(region, None)
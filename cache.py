@@ -0,0 +1,148 @@
+from storage import connect
+import json
+import logging
+import re
+import threading
+import time
+
+# Default lifetimes in seconds for fresh prices and for negative results
+DEFAULT_TTL = 6 * 3600
+NOT_FOUND_TTL = 3600
+ERROR_TTL = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    cache_key TEXT PRIMARY KEY,
+    region TEXT NOT NULL,
+    query TEXT NOT NULL,
+    result TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access);
+"""
+
+
+def normalize_query(item_name):
+    # Case, punctuation and whitespace differences map to the same search
+    query = re.sub(r'[^\w\s]', ' ', str(item_name).lower())
+    return ' '.join(query.split())
+
+
+class ResultCache:
+    def __init__(self, db_path='scrape_cache.db', ttl=DEFAULT_TTL, not_found_ttl=NOT_FOUND_TTL,
+                 error_ttl=ERROR_TTL, max_entries=50000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        connection = connect(self.db_path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def _ttl_for(self, result):
+        if result['item_price'] == "Error":
+            return self.error_ttl
+        if result['item_price'] == "Not found":
+            return self.not_found_ttl
+        return self.ttl
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, item_name, region):
+        query = normalize_query(item_name)
+        now = time.time()
+        connection = connect(self.db_path)
+        try:
+            with connection:
+                row = connection.execute(
+                    "SELECT result FROM results WHERE cache_key = ? AND expires_at > ?",
+                    (f"{region}|{query}", now)
+                ).fetchone()
+                if row is not None:
+                    connection.execute(
+                        "UPDATE results SET last_access = ? WHERE cache_key = ?",
+                        (now, f"{region}|{query}")
+                    )
+        finally:
+            connection.close()
+
+        self._count(row is not None)
+        if row is None:
+            return None
+
+        # Cached entries may come from an alias of the requested name
+        result = json.loads(row[0])
+        result['item_name'] = item_name
+        result['from_cache'] = True
+        return result
+
+    def put(self, result, region):
+        ttl = self._ttl_for(result)
+        if ttl <= 0:
+            return
+        query = normalize_query(result['item_name'])
+        now = time.time()
+        stored = {key: value for key, value in result.items() if key != 'from_cache'}
+
+        connection = connect(self.db_path)
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results (cache_key, region, query, result, stored_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (f"{region}|{query}", region, query, json.dumps(stored), now, now + ttl, now)
+                )
+                # Size-bounded LRU: periodically drop the least recently used entries beyond the limit
+                with self._lock:
+                    self._puts += 1
+                    evict = self._puts % 100 == 1
+                if self.max_entries and evict:
+                    connection.execute(
+                        "DELETE FROM results WHERE cache_key IN ("
+                        "SELECT cache_key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+        finally:
+            connection.close()
+
+    def stats(self):
+        connection = connect(self.db_path)
+        try:
+            entries = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        finally:
+            connection.close()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': entries,
+            }
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(f"Result cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries")
+
+    def clear(self):
+        connection = connect(self.db_path)
+        try:
+            with connection:
+                connection.execute("DELETE FROM results")
+        finally:
+            connection.close()
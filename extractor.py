@@ -0,0 +1,226 @@
+from urllib.parse import urljoin
+import re
+
+RESULT_SELECTOR = "div.s-result-item[data-component-type='s-search-result']"
+CAPTCHA_SELECTOR = "form[action*='validateCaptcha']"
+
+# A page is ready to extract once results or a captcha form are present
+READY_SELECTOR = f"{RESULT_SELECTOR}, {CAPTCHA_SELECTOR}"
+
+# Price selectors in order of preference
+PRICE_SELECTORS = [
+    "span.a-price span.a-offscreen",  # Full price with decimals
+    "span.a-price span[aria-hidden='true']",  # Displayed price, whole and fraction spans
+    "span.a-price-whole",  # Just the whole number part
+    "span.a-price",  # Full price element
+    "span[data-a-color='price'] span.a-offscreen"  # Alternative price format
+]
+
+# Product (/dp/ASIN) pages are lighter and more stable than search pages
+PRODUCT_READY_SELECTOR = f"#productTitle, #ASIN, {CAPTCHA_SELECTOR}"
+PRODUCT_PRICE_SELECTORS = [
+    "#corePrice_feature_div span.a-price span.a-offscreen",
+    "#corePriceDisplay_desktop_feature_div span.a-price span.a-offscreen",
+    "#apex_desktop span.a-price span.a-offscreen",
+    "#priceblock_ourprice",
+    "#priceblock_dealprice",
+]
+
+TITLE_SELECTORS = ["h2 a span", "h2 span", "h2"]
+LINK_SELECTORS = ["a.a-link-normal.s-no-outline", "h2 a"]
+
+CURRENCY_SYMBOLS = {'$': 'USD', '£': 'GBP', '€': 'EUR'}
+
+ASIN_PATTERN = re.compile(r'/(?:dp|gp/product)/([A-Z0-9]{10})')
+
+# Collects the raw candidates for the first N results in one WebDriver round trip.
+# Arguments: result selector, price selectors, title selectors, link selectors, limit
+EXTRACT_SCRIPT = """
+const [resultSelector, priceSelectors, titleSelectors, linkSelectors, limit] = arguments;
+const firstText = (root, selectors) => {
+    for (const selector of selectors) {
+        const element = root.querySelector(selector);
+        if (element && element.textContent.trim()) {
+            return element.textContent.trim();
+        }
+    }
+    return null;
+};
+const firstHref = (root, selectors) => {
+    for (const selector of selectors) {
+        const element = root.querySelector(selector);
+        if (element && element.getAttribute('href')) {
+            return element.getAttribute('href');
+        }
+    }
+    return null;
+};
+return Array.from(document.querySelectorAll(resultSelector)).slice(0, limit).map(result => {
+    const prices = {};
+    for (const selector of priceSelectors) {
+        const element = result.querySelector(selector);
+        if (element) {
+            prices[selector] = element.textContent.trim();
+        }
+    }
+    return {
+        asin: result.getAttribute('data-asin'),
+        title: firstText(result, titleSelectors),
+        href: firstHref(result, linkSelectors),
+        prices: prices
+    };
+});
+"""
+
+# Collects the price candidates, ASIN and title of a product page in one round trip.
+# Arguments: product price selectors
+PRODUCT_EXTRACT_SCRIPT = """
+const [priceSelectors] = arguments;
+const prices = {};
+for (const selector of priceSelectors) {
+    const element = document.querySelector(selector);
+    if (element) {
+        prices[selector] = element.textContent.trim();
+    }
+}
+const asinInput = document.querySelector('#ASIN');
+const canonical = document.querySelector("link[rel='canonical']");
+const title = document.querySelector('#productTitle');
+return [{
+    asin: asinInput ? asinInput.value : null,
+    canonical: canonical ? canonical.getAttribute('href') : null,
+    title: title ? title.textContent.trim() : null,
+    href: null,
+    prices: prices
+}];
+"""
+
+
+def parse_price(price_text):
+    # Handles both 1,234.56 and 1.234,56 style prices
+    if not price_text:
+        return None
+    match = re.search(r'\d[\d.,\s]*', price_text)
+    if not match:
+        return None
+    number = re.sub(r'\s', '', match.group()).rstrip('.,')
+
+    if ',' in number and '.' in number:
+        decimal = ',' if number.rfind(',') > number.rfind('.') else '.'
+    elif ',' in number:
+        decimal = ',' if re.search(r',\d{2}$', number) else None
+    else:
+        decimal = '.' if re.search(r'\.\d{1,2}$', number) else None
+
+    if decimal == ',':
+        number = number.replace('.', '').replace(',', '.')
+    elif decimal == '.':
+        number = number.replace(',', '')
+    else:
+        number = number.replace(',', '').replace('.', '')
+
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def detect_currency(price_text):
+    for symbol, currency in CURRENCY_SYMBOLS.items():
+        if symbol in (price_text or ""):
+            return currency, symbol
+    return None, None
+
+
+def asin_from_url(url):
+    match = ASIN_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+
+def _first_text(root, selectors):
+    for selector in selectors:
+        element = root.select_one(selector)
+        if element is not None and element.get_text().strip():
+            return element.get_text().strip()
+    return None
+
+
+def _first_href(root, selectors):
+    for selector in selectors:
+        element = root.select_one(selector)
+        if element is not None and element.get('href'):
+            return element['href']
+    return None
+
+
+def raw_candidates(soup, limit):
+    # Same shape as EXTRACT_SCRIPT, built from parsed HTML
+    candidates = []
+    for result in soup.select(RESULT_SELECTOR)[:limit]:
+        prices = {}
+        for selector in PRICE_SELECTORS:
+            element = result.select_one(selector)
+            if element is not None:
+                prices[selector] = element.get_text().strip()
+        candidates.append({
+            'asin': result.get('data-asin'),
+            'title': _first_text(result, TITLE_SELECTORS),
+            'href': _first_href(result, LINK_SELECTORS),
+            'prices': prices,
+        })
+    return candidates
+
+
+def raw_product(soup):
+    # Same shape as PRODUCT_EXTRACT_SCRIPT, built from parsed HTML
+    prices = {}
+    for selector in PRODUCT_PRICE_SELECTORS:
+        element = soup.select_one(selector)
+        if element is not None:
+            prices[selector] = element.get_text().strip()
+    asin_input = soup.select_one('#ASIN')
+    canonical = soup.select_one("link[rel='canonical']")
+    return {
+        'asin': asin_input.get('value') if asin_input is not None else None,
+        'canonical': canonical.get('href') if canonical is not None else None,
+        'title': _first_text(soup, ['#productTitle']),
+        'href': None,
+        'prices': prices,
+    }
+
+
+def finalize_candidate(raw, base_url, price_selectors=PRICE_SELECTORS):
+    url = urljoin(base_url, raw['href']) if raw.get('href') else None
+    candidate = {
+        'asin': raw.get('asin') or asin_from_url(url) or asin_from_url(raw.get('canonical')),
+        'title': raw.get('title'),
+        'url': url,
+        'price': None,
+        'currency': None,
+        'symbol': None,
+        'selector': None,
+    }
+
+    # Apply the selector priority in-process
+    for selector in price_selectors:
+        price_text = raw.get('prices', {}).get(selector)
+        price = parse_price(price_text)
+        if price is not None:
+            candidate['price'] = price
+            candidate['currency'], candidate['symbol'] = detect_currency(price_text)
+            candidate['selector'] = selector
+            break
+
+    return candidate
+
+
+def extract_candidates(page, base_url, limit=5):
+    raw = page.extracted if page.extracted is not None else raw_candidates(page.soup, limit)
+    return [finalize_candidate(candidate, base_url) for candidate in raw[:limit]]
+
+
+def extract_product(page):
+    raw = page.extracted[0] if page.extracted else raw_product(page.soup)
+    candidate = finalize_candidate(raw, page.url, price_selectors=PRODUCT_PRICE_SELECTORS)
+    candidate['url'] = page.url
+    return candidate
@@ -0,0 +1,226 @@
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+import undetected_chromedriver as uc
+from blocking import BLOCK_MARKERS
+from extractor import CAPTCHA_SELECTOR
+import logging
+import time
+
+# Prefer the C-backed lxml parser when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Load profiles: 'full' behaves like a normal browser, 'lean' skips everything extraction never reads
+LOAD_PROFILES = ('lean', 'full')
+
+# URL patterns blocked over CDP in the lean profile: images, fonts, media, ads and tracking.
+# Amazon serves its CSS and JS from the same /images/ paths as pictures, so those are matched by extension only
+LEAN_BLOCKED_URLS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.m3u8',
+    '*amazon-adsystem.com*', '*fls-na.amazon.*', '*unagi.amazon.*', '*aax-*.amazon-adsystem.com*',
+]
+
+# Checks for a captcha page before running an extraction script and reports the HTTP status of the
+# navigation and the bytes the page pulled in, all in the same round trip.
+# Arguments: captcha selector, then the wrapped script's own arguments
+BLOCK_CHECK_SCRIPT = """
+const navigation = performance.getEntriesByType('navigation');
+const status = navigation.length ? navigation[0].responseStatus || null : null;
+const transferred = navigation.concat(performance.getEntriesByType('resource'))
+    .reduce((total, entry) => total + (entry.transferSize || 0), 0);
+performance.clearResourceTimings();
+if (document.querySelector(arguments[0]) !== null || /robot check/i.test(document.title)) {
+    return {blocked: true, data: null, bytes: transferred, status: status};
+}
+const data = (function () {
+/* SCRIPT */
+}).apply(null, Array.prototype.slice.call(arguments, 1));
+return {blocked: false, data: data, bytes: transferred, status: status};
+"""
+
+
+class FetchResult:
+    def __init__(self, url, status_code, html, engine):
+        self.url = url
+        self.status_code = status_code
+        self.html = html or ""
+        self.engine = engine
+        self.extracted = None
+        self.blocked = False
+        self.bytes_transferred = None
+        self.timings = {}
+        self._soup = None
+
+    @property
+    def soup(self):
+        # Parse lazily and only once per page
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, HTML_PARSER)
+        return self._soup
+
+    def needs_browser(self, ready_selector):
+        # A missing page is a definitive answer, a browser would not do better
+        if self.status_code == 404:
+            return False
+        if self.status_code != 200:
+            return True
+        if any(marker in self.html for marker in BLOCK_MARKERS):
+            return True
+        return self.soup.select_one(ready_selector) is None
+
+
+class HttpFetcher:
+    def __init__(self, user_agent, pool_size=10, timeout=15):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = self._new_session(user_agent)
+
+    def _new_session(self, user_agent):
+        session = requests.Session()
+
+        # Pooled keep-alive connections, retries are handled by the caller
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'User-Agent': user_agent,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Connection': 'keep-alive',
+        })
+        return session
+
+    def reset(self, user_agent):
+        # Fresh cookies, connections and user agent
+        self.session.close()
+        self.session = self._new_session(user_agent)
+
+    def fetch(self, url):
+        started = time.perf_counter()
+        response = self.session.get(url, timeout=self.timeout)
+        if 'charset' not in response.headers.get('Content-Type', ''):
+            response.encoding = 'utf-8'  # requests would otherwise assume ISO-8859-1 and mangle currency symbols
+        page = FetchResult(url, response.status_code, response.text, 'http')
+        page.bytes_transferred = len(response.content)
+        page.timings['navigate'] = time.perf_counter() - started
+        logging.info(f"Fetched {url} over HTTP: {page.bytes_transferred / 1024:.0f} KB")
+        return page
+
+    def close(self):
+        self.session.close()
+
+
+class BrowserFetcher:
+    def __init__(self, user_agent, wait_timeout=10, load_profile='lean'):
+        self.user_agent = user_agent
+        self.wait_timeout = wait_timeout
+        self.load_profile = load_profile if load_profile in LOAD_PROFILES else 'lean'
+        self._driver = None
+
+    @property
+    def driver(self):
+        # Chrome is only started the first time a page actually needs it
+        if self._driver is None:
+            try:
+                # Set up Chrome options
+                options = uc.ChromeOptions()
+                options.add_argument('--headless')
+                options.add_argument('--no-sandbox')
+                options.add_argument('--disable-dev-shm-usage')
+                options.add_argument(f'user-agent={self.user_agent}')
+                if self.load_profile == 'lean':
+                    # Return once the DOM is parsed and skip images, caches and a large viewport
+                    options.page_load_strategy = 'eager'
+                    options.add_argument('--blink-settings=imagesEnabled=false')
+                    options.add_argument('--disk-cache-size=1')
+                    options.add_argument('--media-cache-size=1')
+                    options.add_argument('--window-size=1024,768')
+                    options.add_experimental_option('prefs', {
+                        'profile.managed_default_content_settings.images': 2,
+                        'profile.managed_default_content_settings.fonts': 2,
+                    })
+
+                # Initialize undetected-chromedriver
+                self._driver = uc.Chrome(options=options)
+                self._driver.implicitly_wait(10)
+                if self.load_profile == 'lean':
+                    self._driver.execute_cdp_cmd('Network.enable', {})
+                    self._driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS})
+                    self._driver.execute_cdp_cmd('Network.setCacheDisabled', {'cacheDisabled': True})
+                logging.info(f"Chrome WebDriver initialized successfully ({self.load_profile} profile)")
+
+            except Exception as e:
+                logging.error(f"Failed to initialize WebDriver: {str(e)}")
+                raise Exception("Failed to initialize WebDriver")
+        return self._driver
+
+    @property
+    def started(self):
+        return self._driver is not None
+
+    def fetch(self, url, ready_selector=None, script=None, script_args=()):
+        # Time spent per phase, reported on the returned page
+        timings = {}
+        started = time.perf_counter()
+        if not self.started:
+            self.driver
+            timings['driver_start'] = time.perf_counter() - started
+            started = time.perf_counter()
+
+        self.driver.get(url)
+        timings['navigate'] = time.perf_counter() - started
+
+        # One bounded wait for the page to become ready, never one per selector
+        if ready_selector:
+            started = time.perf_counter()
+            try:
+                WebDriverWait(self.driver, self.wait_timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, ready_selector))
+                )
+            except TimeoutException:
+                logging.debug(f"Timed out waiting for {ready_selector} on {url}")
+            timings['wait'] = time.perf_counter() - started
+
+        # With a script, everything is collected in a single round trip instead of transferring page_source
+        started = time.perf_counter()
+        if script:
+            page = FetchResult(url, 200, "", 'browser')
+            outcome = self.driver.execute_script(
+                BLOCK_CHECK_SCRIPT.replace('/* SCRIPT */', script), CAPTCHA_SELECTOR, *script_args
+            ) or {}
+            timings['script'] = time.perf_counter() - started
+            page.timings = timings
+            # Chrome reports the navigation's status from version 109 on; older versions keep the 200
+            page.status_code = outcome.get('status') or 200
+            page.blocked = bool(outcome.get('blocked'))
+            page.extracted = outcome.get('data') or []
+            page.bytes_transferred = outcome.get('bytes')
+            if page.bytes_transferred is not None:
+                logging.info(f"Fetched {url} in Chrome: {page.bytes_transferred / 1024:.0f} KB transferred")
+            return page
+
+        page = FetchResult(url, 200, self.driver.page_source, 'browser')
+        timings['page_source'] = time.perf_counter() - started
+        page.timings = timings
+        return page
+
+    def reset(self, user_agent):
+        # The next fetch starts a new Chrome session with the new user agent
+        self.close()
+        self.user_agent = user_agent
+
+    def close(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+            logging.info("WebDriver closed successfully")
@@ -0,0 +1,123 @@
+import argparse
+import io
+import pandas as pd
+from cache import normalize_query
+from storage import atomic_replace, catalog_lock
+import logging
+import os
+import shutil
+import sys
+
+CATALOG_COLUMNS = ['item_name', 'item_price', 'currency', 'currency_symbol', 'item_url']
+
+
+def read_names(source, chunk_size=10000):
+    # Yields batches of names from a CSV with an item_name column (or its first column),
+    # or from plain text with one name per line; source is a path or a binary file object
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    if name.lower().endswith('.csv'):
+        for chunk in pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False):
+            column = 'item_name' if 'item_name' in chunk.columns else chunk.columns[0]
+            yield chunk[column].tolist()
+        return
+
+    lines = open(source, encoding='utf-8') if isinstance(source, str) else io.TextIOWrapper(source, encoding='utf-8')
+    try:
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= chunk_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        if isinstance(source, str):
+            lines.close()
+        else:
+            lines.detach()
+
+
+def catalog_index(csv_file, chunk_size=10000):
+    # Normalized search query of every item already in the catalog
+    index = set()
+    if not os.path.exists(csv_file):
+        return index
+    for chunk in pd.read_csv(csv_file, usecols=['item_name'], chunksize=chunk_size, dtype=str, keep_default_na=False):
+        index.update(normalize_query(name) for name in chunk['item_name'])
+    return index
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as catalog:
+        catalog.seek(0, os.SEEK_END)
+        if catalog.tell() == 0:
+            return True
+        catalog.seek(-1, os.SEEK_END)
+        return catalog.read(1) == b'\n'
+
+
+def import_items(batches, csv_file='products.csv'):
+    # Appends names whose normalized query is not in the catalog yet; the catalog is copied
+    # and replaced in one step under the catalog lock, so it is never rewritten through pandas,
+    # readers never see a partial file and concurrent writers are not lost
+    with catalog_lock(csv_file):
+        index = catalog_index(csv_file)
+        stats = {'read': 0, 'added': 0, 'duplicates': 0, 'empty': 0}
+
+        if os.path.exists(csv_file):
+            columns = pd.read_csv(csv_file, nrows=0).columns.tolist()
+        else:
+            columns = CATALOG_COLUMNS
+
+        with atomic_replace(csv_file) as tmp_file:
+            if os.path.exists(csv_file):
+                with open(csv_file, newline='') as catalog:
+                    shutil.copyfileobj(catalog, tmp_file)
+                if not _ends_with_newline(csv_file):
+                    tmp_file.write('\n')
+            else:
+                pd.DataFrame(columns=columns).to_csv(tmp_file, index=False)
+
+            for batch in batches:
+                new_names = []
+                for name in batch:
+                    stats['read'] += 1
+                    name = ' '.join(str(name).split())
+                    key = normalize_query(name)
+                    if not key:
+                        stats['empty'] += 1
+                        continue
+                    if key in index:
+                        stats['duplicates'] += 1
+                        continue
+                    index.add(key)
+                    new_names.append(name)
+
+                if new_names:
+                    rows = pd.DataFrame({'item_name': new_names}).reindex(columns=columns, fill_value='')
+                    rows.to_csv(tmp_file, index=False, header=False)
+                    stats['added'] += len(new_names)
+
+    logging.info(
+        f"Imported {stats['added']} of {stats['read']} items into {csv_file} "
+        f"({stats['duplicates']} duplicates, {stats['empty']} empty)"
+    )
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import items into the catalog, skipping near-duplicates")
+    parser.add_argument('source', help="CSV with an item_name column, or a text file with one item per line")
+    parser.add_argument('--catalog', default="products.csv", help="Catalog CSV the items are added to")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Number of input rows read at a time")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    if not os.path.exists(args.source):
+        logging.error(f"Input file not found: {args.source}")
+        sys.exit(1)
+    import_items(read_names(args.source, chunk_size=args.chunk_size), args.catalog)
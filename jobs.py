@@ -0,0 +1,140 @@
+from collections import deque
+import pandas as pd
+from scraper import FAILED_PRICES, AmazonScraper
+import logging
+import threading
+import time
+import uuid
+
+ACTIVE = 'running'
+
+
+class ScrapeJob:
+    def __init__(self, csv_file, region, scrape_options):
+        self.id = uuid.uuid4().hex[:8]
+        self.csv_file = csv_file
+        self.region = region
+        self.scrape_options = scrape_options
+        self.status = ACTIVE
+        self.total = 0
+        # Latest outcome per item name: blocked items that are retried, aliases and names
+        # repeated in later chunks report more than once but count as one item
+        self.outcomes = {}
+        self.current_item = None
+        self.recent_results = deque(maxlen=100)
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status == ACTIVE
+
+    def record(self, result):
+        with self._lock:
+            self.outcomes[result['item_name']] = result['item_price'] not in FAILED_PRICES
+            self.current_item = result['item_name']
+            self.recent_results.append(result)
+
+    def finish(self, status, error=None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        # A consistent copy for UI sessions polling from other threads
+        with self._lock:
+            done = len(self.outcomes)
+            # Rows imported while the job runs are scraped too but were not counted up front
+            total = max(self.total, done)
+            return {
+                'id': self.id,
+                'region': self.region,
+                'status': self.status,
+                'total': total,
+                'done': done,
+                'failed': done - sum(self.outcomes.values()),
+                'progress': done / total if total else 0.0,
+                'current_item': self.current_item,
+                'recent_results': list(self.recent_results),
+                'error': self.error,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class JobRunner:
+    def __init__(self, scraper_factory=AmazonScraper):
+        self.scraper_factory = scraper_factory
+        self._jobs = {}
+        self._latest_by_region = {}
+        self._lock = threading.Lock()
+
+    def submit(self, csv_file, region, **scrape_options):
+        # One active job per region; later submissions attach to the running one
+        with self._lock:
+            current = self._latest_by_region.get(region)
+            if current is not None and current.active:
+                logging.info(f"Job {current.id} is already running for {region}")
+                return current
+
+            job = ScrapeJob(csv_file, region, scrape_options)
+            self._jobs[job.id] = job
+            self._latest_by_region[region] = job
+
+        thread = threading.Thread(target=self._run, args=(job,), name=f"scrape-job-{job.id}", daemon=True)
+        thread.start()
+        logging.info(f"Started job {job.id} for {region}")
+        return job
+
+    def _run(self, job):
+        scraper = None
+        try:
+            names = set()
+            for chunk in pd.read_csv(job.csv_file, usecols=['item_name'], chunksize=10000):
+                names.update(chunk['item_name'].dropna())
+            only = job.scrape_options.get('only')
+            job.total = len(names if only is None else names & set(only))
+
+            scraper = self.scraper_factory(job.csv_file, region=job.region)
+            scraper.run_streaming(on_result=job.record, cancel_event=job.cancel_event, **job.scrape_options)
+            job.finish('cancelled' if job.cancel_event.is_set() else 'completed')
+
+        except Exception as e:
+            logging.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+            job.finish('failed', error=str(e))
+        finally:
+            if scraper is not None:
+                scraper.close()
+        logging.info(f"Job {job.id} for {job.region} {job.status}")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self, region):
+        with self._lock:
+            return self._latest_by_region.get(region)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and job.active:
+            job.cancel_event.set()
+            logging.info(f"Cancelling job {job.id}")
+        return job
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    # Process-wide runner shared by every UI session
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
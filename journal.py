@@ -0,0 +1,83 @@
+from storage import connect, execute, execute_in
+import json
+import os
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    csv_file TEXT NOT NULL,
+    region TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_source ON runs (csv_file, region, finished_at);
+
+CREATE TABLE IF NOT EXISTS run_items (
+    run_id INTEGER NOT NULL,
+    item_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, item_name)
+);
+"""
+
+
+class RunJournal:
+    def __init__(self, db_path='scrape_runs.db'):
+        self.db_path = db_path
+        connection = connect(self.db_path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def start_run(self, csv_file, region):
+        return execute(
+            self.db_path,
+            "INSERT INTO runs (csv_file, region, started_at) VALUES (?, ?, ?)",
+            (os.path.abspath(csv_file), region, time.time())
+        ).lastrowid
+
+    def find_unfinished(self, csv_file, region):
+        rows = execute(
+            self.db_path,
+            "SELECT run_id FROM runs WHERE csv_file = ? AND region = ? AND finished_at IS NULL "
+            "ORDER BY started_at DESC LIMIT 1",
+            (os.path.abspath(csv_file), region)
+        )
+        return rows[0][0] if rows else None
+
+    def finish_run(self, run_id):
+        execute(self.db_path, "UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def failed_count(self, run_id):
+        rows = execute(self.db_path, "SELECT COUNT(*) FROM run_items WHERE run_id = ? AND status = 'failed'", (run_id,))
+        return rows[0][0]
+
+    def record(self, run_id, result):
+        # Errors are retried by a resumed run, everything else counts as finished
+        status = 'failed' if result['item_price'] == "Error" else 'done'
+        stored = {key: value for key, value in result.items() if key != 'from_cache'}
+        execute(
+            self.db_path,
+            "INSERT OR REPLACE INTO run_items (run_id, item_name, status, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (run_id, result['item_name'], status, json.dumps(stored), time.time())
+        )
+
+    def finished_items(self, run_id, item_names):
+        rows = execute_in(
+            self.db_path,
+            "SELECT item_name FROM run_items WHERE run_id = ? AND status = 'done' AND item_name IN ({placeholders})",
+            item_names, (run_id,)
+        )
+        return {row[0] for row in rows}
+
+    def results(self, run_id, item_names):
+        rows = execute_in(
+            self.db_path,
+            "SELECT item_name, result FROM run_items WHERE run_id = ? AND item_name IN ({placeholders})",
+            item_names, (run_id,)
+        )
+        return {item_name: json.loads(result) for item_name, result in rows}
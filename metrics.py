@@ -0,0 +1,229 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cProfile
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+
+# Histogram bucket bounds in seconds, from a cached lookup up to a slow Chrome start
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PREFIX = 'scraper_'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'mean': round(self.sum / self.count, 4) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 4),
+        }
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for key, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class Metrics:
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, phase, **labels):
+        # Times one phase of an item, e.g. navigate, wait, extract or persist
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('phase_seconds', time.perf_counter() - started, phase=phase, **labels)
+
+    def record_phases(self, timings, **labels):
+        # Timings measured by the fetchers, keyed by phase
+        for phase, seconds in timings.items():
+            self.observe('phase_seconds', seconds, phase=phase, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def selector_hit_rates(self):
+        # Share of priced search results each price selector matched, per region
+        with self._lock:
+            hits = [(dict(labels), value) for (name, labels), value in self._counters.items() if name == 'selector_hits_total']
+        totals = {}
+        for labels, value in hits:
+            totals[labels['region']] = totals.get(labels['region'], 0) + value
+        rates = {}
+        for labels, value in hits:
+            rates.setdefault(labels['region'], {})[labels['selector']] = round(value / totals[labels['region']], 3)
+        return rates
+
+    def snapshot(self):
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                dict({'name': name, 'labels': dict(labels)}, **histogram.as_dict())
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'counters': counters,
+            'histograms': histograms,
+            'selector_hit_rates': self.selector_hit_rates(),
+        }
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} counter")
+                    typed.add(name)
+                lines.append(f"{PREFIX}{name}{_label_text(labels)} {value}")
+
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{name}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{PREFIX}{name}_bucket{_label_text(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{PREFIX}{name}_sum{_label_text(labels)} {histogram.sum:.6f}")
+                lines.append(f"{PREFIX}{name}_count{_label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # JSON for .json files, Prometheus text format (e.g. for node_exporter's textfile collector) otherwise
+        if path.endswith('.json'):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as tmp:
+                tmp.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logging.info(f"Metrics written to {path}")
+
+    def serve(self, port, host='127.0.0.1'):
+        # /metrics in Prometheus text format and /stats as JSON, served from a daemon thread
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics'):
+                    body, content_type = metrics.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path.startswith('/stats'):
+                    body, content_type = json.dumps(metrics.snapshot()), 'application/json'
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logging.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics and /stats")
+        return server
+
+
+# Shared by every scraper and worker thread in the process
+METRICS = Metrics()
+
+
+@contextmanager
+def profiled(path=None, top=25):
+    # Optional cProfile hook around a run; stats are dumped to path and the hottest calls logged
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        stats = pstats.Stats(profiler)
+        stats.sort_stats('cumulative')
+        logging.info(f"Profile written to {path}, inspect with: python -m pstats {path}")
+        stats.print_stats(top)
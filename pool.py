@@ -0,0 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor
+from storage import FAILED_PRICES
+import logging
+import os
+import threading
+import time
+
+
+def process_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        return 0
+    return 0
+
+
+def process_tree(root_pid):
+    # The process and all of its descendants, read from /proc/<pid>/task/*/children
+    pids = [root_pid]
+    for pid in pids:  # grows while it is walked, breadth first
+        try:
+            tasks = os.listdir(f"/proc/{pid}/task")
+        except OSError:
+            continue
+        for task in tasks:
+            try:
+                with open(f"/proc/{pid}/task/{task}/children") as children:
+                    pids.extend(int(child) for child in children.read().split())
+            except (OSError, ValueError):
+                continue
+    return pids
+
+
+def browser_rss_mb(scraper):
+    # Resident memory of the scraper's Chrome process tree; page memory lives in the renderer
+    # and GPU child processes, not the browser process. None when it is unknown
+    browser = getattr(scraper, 'browser', None)
+    if browser is None or not browser.started:
+        return None
+    pid = getattr(browser.driver, 'browser_pid', None)
+    if not pid or not os.path.exists(f"/proc/{pid}"):
+        return None
+    return sum(process_rss_kb(child) for child in process_tree(pid)) / 1024
+
+
+def browser_alive(scraper):
+    browser = getattr(scraper, 'browser', None)
+    if browser is None or not browser.started:
+        return True
+    try:
+        browser.driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+class WorkerStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.ok = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.recycles = 0
+
+    def as_dict(self):
+        return {
+            'worker': self.name,
+            'items': self.items,
+            'ok': self.ok,
+            'failed': self.failed,
+            'recycles': self.recycles,
+            'busy_seconds': round(self.busy_seconds, 2),
+            'items_per_sec': round(self.items / self.busy_seconds, 3) if self.busy_seconds else 0.0,
+        }
+
+
+class ScraperPool:
+    def __init__(self, scraper_factory, workers=4, max_items_per_scraper=200, max_rss_mb=1500):
+        self.scraper_factory = scraper_factory
+        self.workers = max(1, int(workers))
+        self.max_items_per_scraper = max_items_per_scraper
+        self.max_rss_mb = max_rss_mb
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._scrapers = []
+        self._stats = {}
+        self._executor = None
+
+    def _worker(self):
+        # Each pool thread keeps one warm scraper (and Chrome session) for its lifetime
+        local = self._local
+        if getattr(local, 'scraper', None) is None:
+            local.scraper = self.scraper_factory()
+            local.served = 0
+            with self._lock:
+                self._scrapers.append(local.scraper)
+                name = threading.current_thread().name
+                local.stats = self._stats.setdefault(name, WorkerStats(name))
+        return local
+
+    def _recycle(self, local, reason):
+        logging.info(f"Recycling scraper on {local.stats.name}: {reason}")
+        with self._lock:
+            if local.scraper in self._scrapers:
+                self._scrapers.remove(local.scraper)
+        try:
+            local.scraper.close()
+        except Exception as e:
+            logging.error(f"Error closing scraper: {str(e)}")
+        local.scraper = None
+        local.stats.recycles += 1
+
+    def _scrape_one(self, item, on_result=None, cancel_event=None):
+        # Items still queued when a run is cancelled are skipped
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+
+        local = self._worker()
+        started = time.perf_counter()
+        # Items are either names or (name, region) tasks
+        result = local.scraper.scrape_item(*item) if isinstance(item, tuple) else local.scraper.scrape_item(item)
+        local.stats.busy_seconds += time.perf_counter() - started
+
+        local.served += 1
+        local.stats.items += 1
+        if result['item_price'] in FAILED_PRICES:
+            local.stats.failed += 1
+        else:
+            local.stats.ok += 1
+
+        # Replace drivers that crashed, served too many pages or grew too large
+        if result['item_price'] == "Error" and not browser_alive(local.scraper):
+            self._recycle(local, "browser session died")
+        elif self.max_items_per_scraper and local.served >= self.max_items_per_scraper:
+            self._recycle(local, f"served {local.served} items")
+        else:
+            rss = browser_rss_mb(local.scraper)
+            if rss is not None and self.max_rss_mb and rss > self.max_rss_mb:
+                self._recycle(local, f"browser using {rss:.0f} MB")
+
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    def scrape(self, items, on_result=None, cancel_event=None):
+        items = list(items)
+        logging.info(f"Scraping {len(items)} items with {self.workers} workers")
+        started = time.perf_counter()
+
+        # The executor outlives a single call so its scrapers stay warm between runs
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scraper')
+
+        # map() yields results in input order regardless of completion order
+        results = self._executor.map(lambda item: self._scrape_one(item, on_result, cancel_event), items)
+        results = [result for result in results if result is not None]
+
+        elapsed = time.perf_counter() - started
+        for stats in self.stats():
+            logging.info(f"Worker {stats['worker']}: {stats['items']} items, {stats['items_per_sec']} items/sec, {stats['recycles']} recycles")
+        if elapsed:
+            logging.info(f"Pool throughput: {len(results) / elapsed:.3f} items/sec")
+        return results
+
+    def stats(self):
+        with self._lock:
+            return [stats.as_dict() for stats in self._stats.values()]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            scrapers, self._scrapers = self._scrapers, []
+        for scraper in scrapers:
+            try:
+                scraper.close()
+            except Exception as e:
+                logging.error(f"Error closing scraper: {str(e)}")
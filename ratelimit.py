@@ -0,0 +1,72 @@
+from storage import connect
+import logging
+import time
+
+# Requests per second and burst size per region
+DEFAULT_RATE = 0.5
+DEFAULT_BURST = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    domain TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class RateLimiter:
+    def __init__(self, db_path='rate_limits.db', rate=DEFAULT_RATE, burst=DEFAULT_BURST, region_limits=None):
+        # region_limits maps a region to its own (rate, burst)
+        self.db_path = db_path
+        self.rate = rate
+        self.burst = burst
+        self.region_limits = region_limits or {}
+        connection = connect(self.db_path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def limits(self, region):
+        return self.region_limits.get(region, (self.rate, self.burst))
+
+    def _take(self, domain, rate, burst):
+        # Refill and take a token atomically; the write lock is shared by every process using the file
+        connection = connect(self.db_path)
+        connection.isolation_level = None
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE domain = ?", (domain,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            connection.execute(
+                "INSERT OR REPLACE INTO buckets (domain, tokens, updated_at) VALUES (?, ?, ?)",
+                (domain, tokens, now)
+            )
+            connection.execute("COMMIT")
+            return wait
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def acquire(self, domain, region=None):
+        rate, burst = self.limits(region)
+        waited = 0.0
+        while True:
+            wait = self._take(domain, rate, burst)
+            if wait <= 0:
+                if waited:
+                    logging.debug(f"Waited {waited:.2f}s for a request slot on {domain}")
+                return waited
+            time.sleep(wait)
+            waited += wait
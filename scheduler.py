@@ -0,0 +1,230 @@
+import argparse
+import pandas as pd
+from scraper import ENGINES, AmazonScraper
+from storage import connect, execute, merge_results_into_csv, result_status
+import logging
+import os
+import sys
+import time
+
+# Refresh intervals in seconds: new items start at a day, volatile ones converge to hourly,
+# stable ones back off to a week so even the quietest item is never older than that
+MIN_INTERVAL = 3600
+MAX_INTERVAL = 7 * 24 * 3600
+INITIAL_INTERVAL = 24 * 3600
+
+# Interval multiplier after an unchanged price, and divisor after a change
+GROWTH = 1.5
+SHRINK = 2.0
+
+# Page loads allowed per tick
+DEFAULT_BUDGET = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule (
+    item_name TEXT NOT NULL,
+    region TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 1.0,
+    interval REAL NOT NULL,
+    next_due REAL NOT NULL,
+    last_checked REAL,
+    last_changed REAL,
+    last_price REAL,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (item_name, region)
+);
+CREATE INDEX IF NOT EXISTS idx_schedule_due ON schedule (region, next_due);
+"""
+
+
+class RefreshScheduler:
+    def __init__(self, db_path='schedule.db', min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 initial_interval=INITIAL_INTERVAL):
+        self.db_path = db_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        connection = connect(self.db_path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def sync(self, csv_file, region, chunk_size=10000):
+        # Mirror the catalog: new items are due right away and removed ones are dropped.
+        # A priority in the CSV overrides the stored one; rows without it keep theirs,
+        # so priorities set with set_priority survive syncs
+        synced_at = time.time()
+        added = 0
+        connection = connect(self.db_path)
+        try:
+            for chunk in pd.read_csv(csv_file, chunksize=chunk_size):
+                chunk = chunk.dropna(subset=['item_name'])
+                if 'priority' in chunk.columns:
+                    priorities = pd.to_numeric(chunk['priority'], errors='coerce').clip(lower=0.1)
+                else:
+                    priorities = pd.Series(float('nan'), index=chunk.index)
+                rows = [(name, None if pd.isna(priority) else float(priority))
+                        for name, priority in zip(chunk['item_name'], priorities)]
+                with connection:
+                    before = connection.total_changes
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO schedule (item_name, region, priority, interval, next_due, synced_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [(name, region, 1.0 if priority is None else priority, self.initial_interval, synced_at, synced_at)
+                         for name, priority in rows]
+                    )
+                    added += connection.total_changes - before
+                    connection.executemany(
+                        "UPDATE schedule SET priority = COALESCE(?, priority), synced_at = ? "
+                        "WHERE item_name = ? AND region = ?",
+                        [(priority, synced_at, name, region) for name, priority in rows]
+                    )
+            with connection:
+                removed = connection.execute(
+                    "DELETE FROM schedule WHERE region = ? AND synced_at < ?", (region, synced_at)
+                ).rowcount
+        finally:
+            connection.close()
+        logging.info(f"Schedule synced for {region}: {added} new items, {removed} removed")
+        return added, removed
+
+    def due(self, region, limit=DEFAULT_BUDGET, now=None):
+        # Highest priority first, then the items that are most overdue relative to their interval
+        now = now or time.time()
+        rows = execute(
+            self.db_path,
+            "SELECT item_name FROM schedule WHERE region = ? AND next_due <= ? "
+            "ORDER BY priority DESC, (? - next_due) / interval DESC LIMIT ?",
+            (region, now, now, limit)
+        )
+        return [row[0] for row in rows]
+
+    def record(self, result, region, now=None):
+        now = now or time.time()
+        rows = execute(
+            self.db_path,
+            "SELECT priority, interval, last_price FROM schedule WHERE item_name = ? AND region = ?",
+            (result['item_name'], region)
+        )
+        if not rows:
+            return None
+        priority, interval, last_price = rows[0]
+        status = result_status(result['item_price'])
+
+        if result.get('blocked') or status == 'error':
+            # Failures are retried soon without teaching the schedule anything
+            execute(
+                self.db_path,
+                "UPDATE schedule SET next_due = ?, failures = failures + 1 WHERE item_name = ? AND region = ?",
+                (now + self.min_interval, result['item_name'], region)
+            )
+            return self.min_interval
+
+        if result.get('from_cache'):
+            # A cached price is not a new observation, keep the interval as it is
+            execute(
+                self.db_path,
+                "UPDATE schedule SET next_due = ? WHERE item_name = ? AND region = ?",
+                (now + self.clamp(interval / priority), result['item_name'], region)
+            )
+            return interval
+
+        price = float(result['item_price']) if status == 'ok' else None
+        changed = price is not None and last_price is not None and abs(price - last_price) >= 0.005
+        if changed:
+            interval = self.clamp(interval / SHRINK)
+        elif price is not None or status == 'not_found':
+            interval = self.clamp(interval * GROWTH)
+
+        # Priority scales how often an item is checked, within the same bounds
+        next_due = now + self.clamp(interval / priority)
+        execute(
+            self.db_path,
+            "UPDATE schedule SET interval = ?, next_due = ?, last_checked = ?, "
+            "last_price = COALESCE(?, last_price), last_changed = CASE WHEN ? THEN ? ELSE last_changed END, "
+            "checks = checks + 1, changes = changes + ?, failures = 0 "
+            "WHERE item_name = ? AND region = ?",
+            (interval, next_due, now, price, changed, now, int(changed), result['item_name'], region)
+        )
+        return interval
+
+    def set_priority(self, item_name, region, priority):
+        execute(
+            self.db_path,
+            "UPDATE schedule SET priority = ? WHERE item_name = ? AND region = ?",
+            (max(0.1, float(priority)), item_name, region)
+        )
+
+    def stats(self, region, now=None):
+        now = now or time.time()
+        rows = execute(
+            self.db_path,
+            "SELECT COUNT(*), SUM(next_due <= ?), SUM(86400.0 * priority / interval), "
+            "MIN(interval), MAX(interval) FROM schedule WHERE region = ?",
+            (now, region)
+        )
+        items, due, loads_per_day, shortest, longest = rows[0]
+        return {
+            'items': items,
+            'due': due or 0,
+            'page_loads_per_day': round(loads_per_day or 0, 1),
+            'min_interval_hours': round(shortest / 3600, 2) if shortest else None,
+            'max_interval_hours': round(longest / 3600, 2) if longest else None,
+        }
+
+
+def run_tick(scraper, schedule, budget=DEFAULT_BUDGET, workers=1):
+    # Refresh only the items that are due, at most budget of them, and write them back to the catalog
+    region = scraper.region
+    names = schedule.due(region, limit=budget)
+    if not names:
+        logging.info(f"No items due in {region}")
+        return []
+
+    logging.info(f"Refreshing {len(names)} due items in {region}")
+    results = scraper.scrape_items(names, workers=workers, on_result=lambda result: schedule.record(result, region))
+    scraper.record_history(*results)
+    merge_results_into_csv(scraper.csv_file, [result for result in results if not result.get('blocked')])
+    logging.info(f"Schedule for {region}: {schedule.stats(region)}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh due items on an adaptive schedule")
+    parser.add_argument('csv_file', nargs='?', default="products.csv", help="CSV file with an item_name and optional priority column")
+    parser.add_argument('--region', default='US', help="Amazon region to scrape")
+    parser.add_argument('--engine', default='auto', choices=ENGINES, help="Page fetch engine")
+    parser.add_argument('--workers', type=int, default=1, help="Number of concurrent scraper sessions")
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET, help="Maximum page loads per tick")
+    parser.add_argument('--schedule-db', default='schedule.db', help="SQLite file holding the per-item schedule")
+    parser.add_argument('--loop', type=int, help="Keep running, ticking every this many seconds")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.path.exists(args.csv_file):
+        logging.error(f"CSV file not found: {args.csv_file}")
+        sys.exit(1)
+
+    schedule = RefreshScheduler(args.schedule_db)
+    # The schedule decides when a price is stale, so the result cache would only hide changes
+    scraper = AmazonScraper(args.csv_file, region=args.region, engine=args.engine, cache_db=None)
+    try:
+        while True:
+            schedule.sync(args.csv_file, scraper.region)
+            run_tick(scraper, schedule, budget=args.budget, workers=args.workers)
+            if not args.loop:
+                break
+            time.sleep(args.loop)
+    except KeyboardInterrupt:
+        logging.info("Scheduler stopped")
+    finally:
+        scraper.close()
@@ -1,16 +1,25 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import undetected_chromedriver as uc
+import argparse
 import pandas as pd
+import requests
 from fake_useragent import UserAgent
+from fetcher import LOAD_PROFILES, BrowserFetcher, HttpFetcher
+from extractor import (
+    EXTRACT_SCRIPT, LINK_SELECTORS, PRICE_SELECTORS, PRODUCT_EXTRACT_SCRIPT, PRODUCT_PRICE_SELECTORS,
+    PRODUCT_READY_SELECTOR, READY_SELECTOR, RESULT_SELECTOR, TITLE_SELECTORS, extract_candidates, extract_product
+)
+from asin_index import AsinIndex
+from blocking import BlockedError, CircuitBreaker, DomainBackoff, classify_page
+from ratelimit import DEFAULT_BURST, DEFAULT_RATE, RateLimiter
+from pool import ScraperPool
+from storage import FAILED_PRICES, PriceHistory, merge_results_into_csv, result_status, write_csv_atomic
+from cache import DEFAULT_TTL, ResultCache, normalize_query
+from journal import RunJournal
+from metrics import METRICS, profiled
 import logging
 import time
 import os
 import sys
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urljoin, urlparse
 
 # Configure logging for cloud environment
 logging.basicConfig(
@@ -19,8 +28,50 @@ logging.basicConfig(
     handlers=[logging.StreamHandler(sys.stdout)]
 )
 
+# Supported Amazon marketplaces
+REGION_SETTINGS = {
+    'US': {'domain': 'com', 'currency': 'USD', 'symbol': '$'},
+    'UK': {'domain': 'co.uk', 'currency': 'GBP', 'symbol': '£'},
+    'DE': {'domain': 'de', 'currency': 'EUR', 'symbol': '€'},
+    'FR': {'domain': 'fr', 'currency': 'EUR', 'symbol': '€'},
+    'IT': {'domain': 'it', 'currency': 'EUR', 'symbol': '€'},
+    'ES': {'domain': 'es', 'currency': 'EUR', 'symbol': '€'},
+}
+
+# Fetch engines: plain HTTP with a Chrome fallback, HTTP only, or Chrome only
+ENGINES = ('auto', 'http', 'browser')
+
+
+def interleave_regions(item_names, regions):
+    # Rotate the region order per item so consecutive requests go to different domains
+    tasks = []
+    for index, item_name in enumerate(item_names):
+        offset = index % len(regions) if regions else 0
+        for region in regions[offset:] + regions[:offset]:
+            tasks.append((item_name, region))
+    return tasks
+
+
+def to_wide(long_df):
+    # One row per item with price, currency and link columns per region
+    wide = long_df.pivot_table(
+        index='item_name',
+        columns='region',
+        values=['item_price', 'currency', 'currency_symbol', 'item_url'],
+        aggfunc='first',
+        dropna=False
+    )
+    wide = wide.sort_index(axis=1, level=1, sort_remaining=False)
+    wide.columns = [f"{value}_{region}" for value, region in wide.columns]
+    return wide.reset_index()
+
+
 class AmazonScraper:
-    def __init__(self, csv_file, region='US'):
+    def __init__(self, csv_file, region='US', engine='auto', base_url=None, result_limit=5,
+                 history_db='price_history.db', cache_db='scrape_cache.db', cache_ttl=DEFAULT_TTL,
+                 journal_db='scrape_runs.db', asin_db='asin_index.db', max_retries=2,
+                 rate_db='rate_limits.db', rate=DEFAULT_RATE, burst=DEFAULT_BURST, region_limits=None,
+                 load_profile='lean', metrics=None):
         try:
             logging.info(f"Initializing AmazonScraper with CSV file: {csv_file} and region: {region}")
             self.csv_file = csv_file
@@ -28,174 +79,469 @@ class AmazonScraper:
             self.region = region.upper()
             
             # Define region-specific settings
-            self.region_settings = {
-                'US': {'domain': 'com', 'currency': 'USD', 'symbol': '$'},
-                'UK': {'domain': 'co.uk', 'currency': 'GBP', 'symbol': '£'},
-                'DE': {'domain': 'de', 'currency': 'EUR', 'symbol': '€'},
-                'FR': {'domain': 'fr', 'currency': 'EUR', 'symbol': '€'},
-                'IT': {'domain': 'it', 'currency': 'EUR', 'symbol': '€'},
-                'ES': {'domain': 'es', 'currency': 'EUR', 'symbol': '€'},
-            }
+            self.region_settings = REGION_SETTINGS
             
             if self.region not in self.region_settings:
                 logging.warning(f"Unsupported region {region}, defaulting to US")
                 self.region = 'US'
+
+            if engine not in ENGINES:
+                logging.warning(f"Unsupported engine {engine}, defaulting to auto")
+                engine = 'auto'
+            self.engine = engine
+            self.result_limit = result_limit
+            self.history = PriceHistory(history_db) if history_db else None
+            self.cache = ResultCache(cache_db, ttl=cache_ttl) if cache_db else None
+            self.journal_db = journal_db
+            self.asin_index = AsinIndex(asin_db) if asin_db else None
+
+            # Per-phase timings and outcome counters, shared process-wide unless a registry is passed in
+            self.metrics = metrics if metrics is not None else METRICS
+
+            # Blocks back off per domain and trip a per-region circuit breaker
+            self.max_retries = max_retries
+            self.backoff = DomainBackoff()
+            self.breaker = CircuitBreaker()
+
+            # Request pacing is shared per domain by every worker and process using the same rate_db
+            self.limiter = RateLimiter(rate_db, rate=rate, burst=burst, region_limits=region_limits)
                 
             region_data = self.region_settings[self.region]
-            self.base_url = f"https://www.amazon.{region_data['domain']}/s?k="
-            
-            try:
-                # Set up Chrome options
-                options = uc.ChromeOptions()
-                options.add_argument('--headless')
-                options.add_argument('--no-sandbox')
-                options.add_argument('--disable-dev-shm-usage')
-                options.add_argument(f'user-agent={self.ua.random}')
-                
-                # Initialize undetected-chromedriver
-                self.driver = uc.Chrome(options=options)
-                self.driver.implicitly_wait(10)
-                logging.info("Chrome WebDriver initialized successfully")
-                
-            except Exception as e:
-                logging.error(f"Failed to initialize WebDriver: {str(e)}")
-                raise Exception("Failed to initialize WebDriver")
+            self.base_url = base_url or f"https://www.amazon.{region_data['domain']}/s?k="
+
+            # Search URLs for every region, so one scraper and its sessions can serve all of them
+            self.base_urls = {
+                code: f"https://www.amazon.{settings['domain']}/s?k=" for code, settings in self.region_settings.items()
+            }
+            self.base_urls[self.region] = self.base_url
+
+            user_agent = self.ua.random
+            self.user_agent = user_agent
+            self.http = HttpFetcher(user_agent) if self.engine != 'browser' else None
+            self.load_profile = load_profile
+            self.browser = BrowserFetcher(user_agent, load_profile=load_profile) if self.engine != 'http' else None
+
+            # Browser-only mode keeps the eager start so driver problems surface immediately
+            if self.engine == 'browser':
+                self.browser.driver
 
         except Exception as e:
             logging.error(f"Error initializing scraper: {str(e)}", exc_info=True)
             raise
 
-    def get_price(self, item_name):
+    @property
+    def driver(self):
+        if self.browser is None:
+            raise RuntimeError("WebDriver is not available with the http engine")
+        return self.browser.driver
+
+    def fetch_page(self, url, ready_selector=READY_SELECTOR, script=EXTRACT_SCRIPT, script_args=None, region=None):
+        domain = urlparse(url).netloc
+        region = region or self.region
+        if self.http is not None:
+            try:
+                self.metrics.observe('phase_seconds', self.limiter.acquire(domain, region), phase='rate_wait', region=region, engine='http')
+                page = self.http.fetch(url)
+                self.record_fetch(page, region)
+                # A captcha or throttling response is a block, Chrome would only be blocked more slowly
+                verdict = classify_page(page)
+                if verdict != 'ok':
+                    raise BlockedError(url, verdict)
+                if self.browser is None or not page.needs_browser(ready_selector):
+                    return page
+                self.metrics.inc('browser_fallbacks_total', region=region, reason=str(page.status_code))
+                logging.info(f"HTTP fetch needs a browser (status {page.status_code}), falling back to Chrome")
+            except requests.RequestException as e:
+                if self.browser is None:
+                    raise
+                self.metrics.inc('browser_fallbacks_total', region=region, reason='http_error')
+                logging.warning(f"HTTP fetch failed for {url}: {str(e)}, falling back to Chrome")
+
+        if script_args is None:
+            script_args = (RESULT_SELECTOR, PRICE_SELECTORS, TITLE_SELECTORS, LINK_SELECTORS, self.result_limit)
+        self.metrics.observe('phase_seconds', self.limiter.acquire(domain, region), phase='rate_wait', region=region, engine='browser')
+        page = self.browser.fetch(url, ready_selector=ready_selector, script=script, script_args=script_args)
+        self.record_fetch(page, region)
+        return page
+
+    def record_fetch(self, page, region):
+        self.metrics.record_phases(page.timings, region=region, engine=page.engine)
+        self.metrics.inc('fetches_total', region=region, engine=page.engine, status=str(page.status_code))
+        if page.bytes_transferred is not None:
+            self.metrics.inc('bytes_transferred_total', page.bytes_transferred, region=region, engine=page.engine)
+
+    def fetch_checked(self, url, **fetch_options):
+        # Classify the page right after navigation so blocks fail fast instead of waiting out selectors
+        page = self.fetch_page(url, **fetch_options)
+        verdict = classify_page(page)
+        if verdict != 'ok':
+            raise BlockedError(url, verdict)
+        return page
+
+    def rotate_identity(self):
+        # New user agent, cookies and browser session after the breaker trips
+        self.user_agent = self.ua.random
+        if self.http is not None:
+            self.http.reset(self.user_agent)
+        if self.browser is not None:
+            self.browser.reset(self.user_agent)
+        logging.info("Rotated user agent and sessions")
+
+    def new_result(self, item_name, region, item_url):
+        return {
+            'item_name': item_name,
+            'region': region,
+            'item_price': "Not found",
+            'item_url': item_url,
+            'currency': "",
+            'currency_symbol': "",
+            'asin': None,
+        }
+
+    def blocked_result(self, item_name, region):
+        # Blocked items are reported as errors so the journal requeues them
+        result = self.new_result(item_name, region, self.base_urls[region] + quote_plus(item_name))
+        result['item_price'] = "Error"
+        result['blocked'] = True
+        return result
+
+    def record_item(self, result, region, started):
+        # Outcome counter and end-to-end latency per item
+        if result.get('from_cache'):
+            status = 'cached'
+        elif result.get('blocked'):
+            status = 'blocked'
+        else:
+            status = result_status(result['item_price'])
+        self.metrics.inc('items_total', region=region, status=status)
+        self.metrics.observe('item_seconds', time.perf_counter() - started, region=region)
+        return result
+
+    def scrape_item(self, item_name, region=None):
+        region = region or self.region
+        started = time.perf_counter()
+
+        # Serve fresh results from the cache without touching the network
+        if self.cache is not None:
+            with self.metrics.span('cache_lookup', region=region):
+                cached = self.cache.get(item_name, region)
+            if cached is not None:
+                logging.info(f"Using cached price for {item_name}: {cached['item_price']}")
+                return self.record_item(cached, region, started)
+
+        # While the region's circuit is open, fail immediately without touching the network
+        if not self.breaker.allow(region):
+            result = self.blocked_result(item_name, region)
+            result['circuit_open'] = True
+            return self.record_item(result, region, started)
+
+        domain = self.region_settings[region]['domain']
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self.fetch_item(item_name, region)
+            except BlockedError as e:
+                logging.warning(f"{str(e)} for {item_name} (attempt {attempt + 1}/{self.max_retries + 1})")
+                self.metrics.inc('blocks_total', region=region, reason=e.reason)
+                self.backoff.failure(domain)
+                if self.breaker.record_block(region):
+                    self.rotate_identity()
+                    break
+                # Another worker may have opened the circuit in the meantime
+                if not self.breaker.allow(region):
+                    break
+                if attempt < self.max_retries:
+                    with self.metrics.span('backoff', region=region):
+                        time.sleep(self.backoff.delay(domain))
+                continue
+
+            self.backoff.success(domain)
+            self.breaker.record_success(region)
+            if self.cache is not None:
+                self.cache.put(result, region)
+            return self.record_item(result, region, started)
+
+        return self.record_item(self.blocked_result(item_name, region), region, started)
+
+    def fetch_item(self, item_name, region=None):
+        region = region or self.region
+
+        # Known items go straight to their product page, skipping the search page
+        if self.asin_index is not None:
+            entry = self.asin_index.get(item_name, region)
+            if entry is not None:
+                result = self.fetch_product(item_name, region, entry['asin'])
+                if result is not None:
+                    return result
+                logging.info(f"Re-resolving {item_name} in {region} through search")
+                self.asin_index.invalidate(item_name, region)
+
+        result = self.search_item(item_name, region)
+        if self.asin_index is not None and result['asin'] and result['item_price'] not in FAILED_PRICES:
+            self.asin_index.put(item_name, region, result['asin'], result['item_url'])
+        return result
+
+    def fetch_product(self, item_name, region, asin):
+        # Returns None only when the product page is gone or shows another ASIN, so the item is
+        # resolved through search again; any other failure keeps the ASIN for the next refresh
+        settings = self.region_settings[region]
+        # Relative to the search URL, so a base_url with a path prefix (e.g. a local server) keeps it
+        product_url = urljoin(self.base_urls[region], f"dp/{asin}")
+        result = self.new_result(item_name, region, product_url)
+        result['asin'] = asin
         try:
-            search_url = self.base_url + quote_plus(item_name)
-            logging.info(f"Searching for: {item_name}")
-            logging.info(f"URL: {search_url}")
-            
-            self.driver.get(search_url)
-            logging.info("Page loaded successfully")
-            
-            # Wait for price elements to load
-            wait = WebDriverWait(self.driver, 10)
-            
-            # Try different price selectors in order of preference
-            price_selectors = [
-                "span.a-price span.a-offscreen",  # Full price with decimals
-                "span.a-price-whole",  # Just the whole number part
-                "span.a-price",  # Full price element
-                "span[data-a-color='price'] span.a-offscreen"  # Alternative price format
-            ]
-            
-            for selector in price_selectors:
-                try:
-                    price_element = wait.until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    price_text = price_element.get_attribute("textContent").strip()
-                    
-                    # Clean up the price text
-                    price_text = price_text.replace('$', '').replace(',', '').strip()
-                    
-                    # Extract numeric value
-                    import re
-                    price_match = re.search(r'(\d+\.?\d*)', price_text)
-                    if price_match:
-                        price = float(price_match.group(1))
-                        currency = self.region_settings[self.region]['currency']
-                        logging.info(f"Price found for {item_name}: {self.region_settings[self.region]['symbol']}{price:.2f} ({currency})")
-                        return f"{price:.2f}"
-                except (TimeoutException, NoSuchElementException, ValueError) as e:
-                    logging.debug(f"Failed with selector {selector}: {str(e)}")
-                    continue
-            
-            logging.warning(f"No valid price found for {item_name}")
-            return None
+            page = self.fetch_checked(
+                product_url,
+                ready_selector=PRODUCT_READY_SELECTOR,
+                script=PRODUCT_EXTRACT_SCRIPT,
+                script_args=(PRODUCT_PRICE_SELECTORS,),
+                region=region
+            )
+            if page.status_code == 404:
+                logging.info(f"Product page for {asin} no longer exists")
+                self.metrics.inc('asin_refreshes_total', region=region, outcome='gone')
+                return None
+            if page.status_code != 200:
+                raise RuntimeError(f"HTTP {page.status_code}")
 
+            with self.metrics.span('extract', region=region, engine=page.engine):
+                product = extract_product(page)
+            if product['asin'] is None and product['title'] is None:
+                # Amazon's "page not found" dog page, or any other page that is not a product
+                logging.info(f"Page for {asin} is not a product page any more")
+                self.metrics.inc('asin_refreshes_total', region=region, outcome='gone')
+                return None
+            if product['asin'] and product['asin'] != asin:
+                logging.info(f"ASIN for {item_name} changed from {asin} to {product['asin']}")
+                self.metrics.inc('asin_refreshes_total', region=region, outcome='changed')
+                return None
+            if product['price'] is None:
+                # Out of stock or unavailable right now, the product itself is still the right one
+                logging.warning(f"No price on product page for {asin}")
+                self.metrics.inc('asin_refreshes_total', region=region, outcome='no_price')
+                return result
+
+        except BlockedError:
+            raise
         except Exception as e:
-            logging.error(f"Error processing {item_name}: {str(e)}", exc_info=True)
+            logging.warning(f"Error fetching product page for {asin}: {str(e)}")
+            self.metrics.inc('asin_refreshes_total', region=region, outcome='error')
+            result['item_price'] = "Error"
+            return result
+
+        self.metrics.inc('asin_refreshes_total', region=region, outcome='ok')
+        result['item_price'] = f"{product['price']:.2f}"
+        result['currency'] = product['currency'] or settings['currency']
+        result['currency_symbol'] = product['symbol'] or settings['symbol']
+        logging.info(f"Scraped price for {item_name}: {result['currency_symbol']}{result['item_price']} ({result['currency']}) via {page.engine} product page {asin}")
+        return result
+
+    def search_item(self, item_name, region):
+        base_url = self.base_urls[region]
+        search_url = base_url + quote_plus(item_name)
+        settings = self.region_settings[region]
+        result = self.new_result(item_name, region, search_url)
+
+        try:
+            page = self.fetch_checked(search_url, region=region)
+            with self.metrics.span('extract', region=region, engine=page.engine):
+                candidates = extract_candidates(page, base_url, limit=self.result_limit)
+
+            # Only the first organic result is the item; a later result's price would belong to
+            # another product, such as an accessory or a bundle
+            match = candidates[0] if candidates else None
+            if match is None or match['price'] is None:
+                reason = "No price on the first result" if candidates else "No results"
+                logging.warning(f"Could not find price for {item_name}: {reason}")
+                return result
+
+            result['item_price'] = f"{match['price']:.2f}"
+            result['item_url'] = match['url'] or search_url
+            result['currency'] = match['currency'] or settings['currency']
+            result['currency_symbol'] = match['symbol'] or settings['symbol']
+            result['asin'] = match['asin']
+            self.metrics.inc('selector_hits_total', region=region, selector=match['selector'])
+            logging.info(f"Scraped price for {item_name}: {result['currency_symbol']}{match['price']:.2f} ({result['currency']}) via {page.engine} using {match['selector']}")
+
+        except BlockedError:
+            raise
+        except Exception as e:
+            logging.error(f"Error processing item {item_name}: {str(e)}")
+            result['item_price'] = "Error"
+
+        return result
+
+    def get_price(self, item_name):
+        logging.info(f"Searching for: {item_name}")
+        result = self.scrape_item(item_name)
+        if result['item_price'] in FAILED_PRICES:
+            logging.warning(f"No valid price found for {item_name}")
             return None
+        return result['item_price']
+
+    def spawn_worker(self):
+        # Same configuration, sharing this scraper's cache; only the parent writes history
+        worker = AmazonScraper(
+            self.csv_file, region=self.region, engine=self.engine, base_url=self.base_url,
+            result_limit=self.result_limit, load_profile=self.load_profile, metrics=self.metrics,
+            history_db=None, cache_db=None, journal_db=None, asin_db=None
+        )
+        worker.cache = self.cache
+        worker.asin_index = self.asin_index
+        worker.backoff = self.backoff
+        worker.breaker = self.breaker
+        worker.limiter = self.limiter
+        return worker
+
+    def make_pool(self, workers):
+        # Hand the items out to a pool of warm scrapers with their own sessions
+        return ScraperPool(self.spawn_worker, workers=workers)
+
+    def scrape_items(self, items, workers=1, on_result=None, pool=None, cancel_event=None):
+        if pool is None and workers <= 1:
+            results = []
+            for item in items:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                # Items are either names or (name, region) tasks
+                result = self.scrape_item(*item) if isinstance(item, tuple) else self.scrape_item(item)
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+            return results
+
+        owned = pool is None
+        if owned:
+            pool = self.make_pool(workers)
+        try:
+            return pool.scrape(items, on_result=on_result, cancel_event=cancel_event)
+        finally:
+            if owned:
+                pool.close()
+
+    def group_aliases(self, item_names, region=None):
+        # Names that normalize to the same search query, or that resolved to the same ASIN in this
+        # region, share one fetch. Maps the name that is scraped to every alias it stands for.
+        asins = self.asin_index.get_many(item_names, region) if self.asin_index is not None and region else {}
+        groups = {}
+        for item_name in item_names:
+            key = ('asin', asins[item_name]) if item_name in asins else ('query', normalize_query(item_name))
+            groups.setdefault(key, []).append(item_name)
+        collapsed = {aliases[0]: aliases for aliases in groups.values()}
+        if len(collapsed) < len(item_names):
+            logging.info(f"Collapsed {len(item_names)} items into {len(collapsed)} fetches")
+            self.metrics.inc('aliases_collapsed_total', len(item_names) - len(collapsed), region=region or 'all')
+        return collapsed
+
+    def scrape_collapsed(self, item_names, region=None, on_result=None, pool=None, cancel_event=None):
+        # Scrape one name per alias group and fan its result out to every alias
+        aliases = self.group_aliases(item_names, region or self.region)
+        results = []
+
+        def fan_out(result):
+            for alias in aliases[result['item_name']]:
+                alias_result = dict(result, item_name=alias)
+                results.append(alias_result)
+                if on_result is not None:
+                    on_result(alias_result)
+
+        self.scrape_items(list(aliases), on_result=fan_out, pool=pool, cancel_event=cancel_event)
+        return results
+
+    def record_history(self, *results):
+        # Every call is one transaction, so callers holding a batch pass it in one go
+        observed = [result for result in results if not result.get('from_cache') and not result.get('blocked')]
+        if self.history is not None and observed:
+            self.history.record_many(observed, self.region)
+
+    def run_streaming(self, workers=1, resume=False, chunk_size=500, on_result=None, cancel_event=None, only=None):
+        # only restricts the run to a set of item names, e.g. the rows that failed or went stale
+        journal = RunJournal(self.journal_db) if self.journal_db else None
+        run_id = None
+        if journal is not None:
+            run_id = journal.find_unfinished(self.csv_file, self.region) if resume else None
+            if run_id is None:
+                run_id = journal.start_run(self.csv_file, self.region)
+            else:
+                logging.info(f"Resuming run {run_id}")
+
+        # Every result is flushed as soon as it arrives so a crash loses at most the item in flight
+        pending = {}
+        blocked = set()
+
+        def flush(result):
+            with self.metrics.span('persist', region=self.region, step='history'):
+                self.record_history(result)
+            if journal is not None:
+                with self.metrics.span('persist', region=self.region, step='journal'):
+                    journal.record(run_id, result)
+            elif not result.get('blocked'):
+                pending[result['item_name']] = result
+            if result.get('blocked'):
+                blocked.add(result['item_name'])
+            else:
+                blocked.discard(result['item_name'])
+            if on_result is not None:
+                on_result(result)
+
+        # One pool serves every chunk so its browser sessions stay warm
+        pool = self.make_pool(workers) if workers > 1 else None
+        processed = 0
+        try:
+            for chunk in pd.read_csv(self.csv_file, chunksize=chunk_size):
+                names = chunk['item_name'].dropna().unique().tolist()
+                if only is not None:
+                    names = [name for name in names if name in only]
+                if journal is not None:
+                    finished = journal.finished_items(run_id, names)
+                    if finished:
+                        logging.info(f"Skipping {len(finished)} items already finished in run {run_id}")
+                    names = [name for name in names if name not in finished]
+                if not names:
+                    continue
+                results = self.scrape_collapsed(names, on_result=flush, pool=pool, cancel_event=cancel_event)
+                processed += len(results)
+                logging.info(f"Processed {processed} items")
+                if cancel_event is not None and cancel_event.is_set():
+                    logging.info(f"Run cancelled after {processed} items")
+                    break
+
+            # Requeue items that hit a block once the region's circuit has closed again
+            if blocked and self.breaker.allow(self.region) and not (cancel_event and cancel_event.is_set()):
+                logging.info(f"Retrying {len(blocked)} blocked items")
+                self.scrape_collapsed(sorted(blocked), on_result=flush, pool=pool, cancel_event=cancel_event)
+        finally:
+            if pool is not None:
+                pool.close()
+
+        # Write the results back to the catalog, again one chunk at a time; blocked items keep their old price.
+        # A cancelled run, or one with blocked or failed items, stays unfinished so --resume can retry them.
+        if blocked:
+            logging.warning(f"{len(blocked)} items were blocked and are left for --resume")
+        if journal is not None:
+            with self.metrics.span('persist', region=self.region, step='csv'):
+                merge_results_into_csv(
+                    self.csv_file,
+                    lambda names: {
+                        name: result for name, result in journal.results(run_id, names).items() if not result.get('blocked')
+                    }
+                )
+            failed = journal.failed_count(run_id)
+            if failed:
+                logging.warning(f"{failed} items failed and are left for --resume")
+            if not failed and (cancel_event is None or not cancel_event.is_set()):
+                journal.finish_run(run_id)
+        else:
+            with self.metrics.span('persist', region=self.region, step='csv'):
+                merge_results_into_csv(self.csv_file, list(pending.values()))
 
-    def scrape_prices(self):
+        if self.cache is not None:
+            self.cache.log_stats()
+        return run_id
+
+    def scrape_prices(self, workers=1, resume=False, chunk_size=500):
         try:
             logging.info("Starting price scraping process")
-            df = pd.read_csv(self.csv_file)
-            prices = []
-            urls = []
-            
-            for item in df['item_name']:
-                try:
-                    search_url = f"https://www.amazon.{self.region_settings[self.region]['domain']}/s?k={quote_plus(item)}"
-                    self.driver.get(search_url)
-                    time.sleep(2)  # Wait for page load
-                    
-                    # Try to find the first product link and price
-                    try:
-                        first_result = WebDriverWait(self.driver, 10).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, "div.s-result-item[data-component-type='s-search-result']"))
-                        )
-                        
-                        # Try different price selectors
-                        price_selectors = [
-                            "span.a-price span.a-offscreen",
-                            "span.a-price-whole",
-                            "span.a-price span[aria-hidden='true']",
-                            "span.a-price"
-                        ]
-                        
-                        price = None
-                        for selector in price_selectors:
-                            try:
-                                price_element = first_result.find_element(By.CSS_SELECTOR, selector)
-                                price_text = price_element.text.strip()
-                                if selector == "span.a-price span.a-offscreen":
-                                    price_text = price_element.get_attribute("textContent").strip()
-                                
-                                # Clean up price text and extract numeric value
-                                price_text = price_text.replace(',', '').replace('$', '').replace('£', '').replace('€', '')
-                                import re
-                                price_match = re.search(r'\d+\.?\d*', price_text)
-                                if price_match:
-                                    price = price_match.group()
-                                    break
-                            except:
-                                continue
-                        
-                        if price is None:
-                            raise NoSuchElementException("No price found with any selector")
-                        
-                        # Get the product URL
-                        product_link = first_result.find_element(By.CSS_SELECTOR, "a.a-link-normal.s-no-outline").get_attribute('href')
-                        
-                        prices.append(price)
-                        urls.append(product_link)
-                        logging.info(f"Scraped price for {item}: {self.region_settings[self.region]['symbol']}{price} ({self.region_settings[self.region]['currency']})")
-                        
-                    except (TimeoutException, NoSuchElementException) as e:
-                        logging.warning(f"Could not find price for {item}: {str(e)}")
-                        prices.append("Not found")
-                        urls.append(search_url)
-                    
-                    except Exception as e:
-                        logging.error(f"Error processing item {item}: {str(e)}")
-                        prices.append("Error")
-                        urls.append(search_url)
-                        
-                except Exception as e:
-                    logging.error(f"Error processing item {item}: {str(e)}")
-                    prices.append("Error")
-                    urls.append(search_url)
-            
-            # Update the DataFrame with all information
-            df['item_price'] = prices
-            df['item_url'] = urls
-            
-            # Set currency information for successful price fetches
-            df.loc[~df['item_price'].isin(["Error", "Not found"]), 'currency'] = self.region_settings[self.region]['currency']
-            df.loc[~df['item_price'].isin(["Error", "Not found"]), 'currency_symbol'] = self.region_settings[self.region]['symbol']
-            
-            # Clear currency info for failed fetches
-            df.loc[df['item_price'].isin(["Error", "Not found"]), ['currency', 'currency_symbol']] = ""
-            
-            df.to_csv(self.csv_file, index=False)
+            self.run_streaming(workers=workers, resume=resume, chunk_size=chunk_size)
             logging.info("Price scraping completed successfully")
             return True
             
@@ -203,7 +549,46 @@ class AmazonScraper:
             logging.error(f"Error in scrape_prices: {str(e)}")
             return False
 
-    def update_prices(self):
+    def scrape_regions(self, regions, output_file, workers=1, chunk_size=500, wide_output=None):
+        regions = [region.upper() for region in regions]
+        unsupported = [region for region in regions if region not in self.region_settings]
+        if unsupported:
+            logging.warning(f"Skipping unsupported regions: {', '.join(unsupported)}")
+        regions = [region for region in regions if region in self.region_settings]
+        logging.info(f"Scraping {self.csv_file} across regions: {', '.join(regions)}")
+
+        columns = ['item_name', 'region', 'item_price', 'currency', 'currency_symbol', 'item_url']
+        pool = self.make_pool(workers) if workers > 1 else None
+        header = True
+        try:
+            for chunk in pd.read_csv(self.csv_file, chunksize=chunk_size):
+                # Aliases are collapsed by search query here, ASINs differ between regions
+                aliases = self.group_aliases(chunk['item_name'].dropna().unique().tolist())
+                results = []
+                for result in self.scrape_items(interleave_regions(list(aliases), regions), pool=pool):
+                    for alias in aliases[result['item_name']]:
+                        results.append(dict(result, item_name=alias))
+                with self.metrics.span('persist', region=self.region, step='history'):
+                    self.record_history(*results)
+
+                # Long format: one row per (item, region), appended chunk by chunk
+                with self.metrics.span('persist', region=self.region, step='csv'):
+                    pd.DataFrame(results, columns=columns).to_csv(
+                        output_file, mode='w' if header else 'a', header=header, index=False
+                    )
+                header = False
+        finally:
+            if pool is not None:
+                pool.close()
+
+        if wide_output:
+            write_csv_atomic(to_wide(pd.read_csv(output_file)), wide_output)
+        if self.cache is not None:
+            self.cache.log_stats()
+        logging.info(f"Multi-region results written to {output_file}")
+        return True
+
+    def update_prices(self, workers=1, resume=False):
         try:
             logging.info("Starting price update process")
             
@@ -212,28 +597,16 @@ class AmazonScraper:
                 logging.error(f"CSV file not found: {self.csv_file}")
                 return False
                 
-            # Read the CSV file
+            # Only the header is needed up front, items are streamed in chunks
             logging.info(f"Reading CSV file: {self.csv_file}")
-            df = pd.read_csv(self.csv_file)
+            df = pd.read_csv(self.csv_file, nrows=0)
             
             if 'item_name' not in df.columns:
                 logging.error("CSV file must contain 'item_name' column")
                 return False
 
-            logging.info(f"Found {len(df)} items to process")
-
-            # Process each item
-            for index, row in df.iterrows():
-                item_name = row['item_name']
-                logging.info(f"Processing item {index + 1}/{len(df)}: {item_name}")
-                price = self.get_price(item_name)
-                df.at[index, 'item_price'] = price
-                logging.info(f"Updated price for {item_name}: {price}")
-                time.sleep(2)  # Be nice to Amazon's servers
-
-            # Save updated DataFrame back to CSV
-            logging.info("Saving updated prices to CSV file")
-            df.to_csv(self.csv_file, index=False)
+            # Process each item, saving prices to the history store and CSV file as they arrive
+            self.run_streaming(workers=workers, resume=resume)
             logging.info(f"CSV file updated successfully with prices in {self.region_settings[self.region]['currency']}")
             return True
 
@@ -241,27 +614,71 @@ class AmazonScraper:
             logging.error(f"Error updating prices: {str(e)}", exc_info=True)
             return False
             
-    def __del__(self):
+    def close(self):
         try:
-            if hasattr(self, 'driver'):
-                self.driver.quit()
-                logging.info("WebDriver closed successfully")
+            if getattr(self, 'http', None) is not None:
+                self.http.close()
+            if getattr(self, 'browser', None) is not None:
+                self.browser.close()
         except Exception as e:
             logging.error(f"Error closing WebDriver: {str(e)}")
 
+    def __del__(self):
+        self.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Amazon Price Scraper")
+    parser.add_argument('csv_file', nargs='?', default="products.csv", help="CSV file with an item_name column")
+    parser.add_argument('--region', default='US', help="Amazon region to scrape")
+    parser.add_argument('--engine', default='auto', choices=ENGINES, help="Page fetch engine")
+    parser.add_argument('--load-profile', default='lean', choices=LOAD_PROFILES, help="What Chrome loads for each page")
+    parser.add_argument('--workers', type=int, default=1, help="Number of concurrent scraper sessions")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Requests per second per Amazon domain")
+    parser.add_argument('--burst', type=int, default=DEFAULT_BURST, help="Requests allowed back to back per domain")
+    parser.add_argument('--cache-ttl', type=int, default=DEFAULT_TTL, help="Seconds a scraped price stays fresh")
+    parser.add_argument('--no-cache', action='store_true', help="Always fetch, ignoring cached results")
+    parser.add_argument('--resume', action='store_true', help="Continue the last unfinished run, skipping finished items")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Number of CSV rows read at a time")
+    parser.add_argument('--regions', help="Comma-separated regions to scrape in one run, e.g. US,UK,DE")
+    parser.add_argument('--output', default="prices_by_region.csv", help="Long-format output of a multi-region run")
+    parser.add_argument('--wide-output', help="Optional one-row-per-item output of a multi-region run")
+    parser.add_argument('--metrics', help="Write run metrics here: JSON for .json files, Prometheus text otherwise")
+    parser.add_argument('--metrics-port', type=int, help="Serve /metrics and /stats on this port while running")
+    parser.add_argument('--profile', help="Run under cProfile and write the stats to this file")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
     try:
         logging.info("Starting Amazon Price Scraper")
-        csv_file = "products.csv"
+        args = parse_args()
+        csv_file = args.csv_file
         
         # Verify CSV file exists
         if not os.path.exists(csv_file):
             logging.error(f"CSV file not found: {csv_file}")
             sys.exit(1)
             
-        scraper = AmazonScraper(csv_file, region='US')
-        success = scraper.scrape_prices()
-        
+        if args.metrics_port is not None:
+            METRICS.serve(args.metrics_port)
+
+        with profiled(args.profile):
+            scraper = AmazonScraper(
+                csv_file, region=args.region, engine=args.engine, load_profile=args.load_profile,
+                cache_db=None if args.no_cache else 'scrape_cache.db', cache_ttl=args.cache_ttl,
+                rate=args.rate, burst=args.burst
+            )
+            if args.regions:
+                success = scraper.scrape_regions(
+                    args.regions.split(','), args.output, workers=args.workers,
+                    chunk_size=args.chunk_size, wide_output=args.wide_output
+                )
+            else:
+                success = scraper.scrape_prices(workers=args.workers, resume=args.resume, chunk_size=args.chunk_size)
+
+        if args.metrics:
+            METRICS.write(args.metrics)
+
         if success:
             logging.info("Scraping process completed successfully")
         else:
@@ -273,4 +690,4 @@ if __name__ == "__main__":
     finally:
         # Ensure the WebDriver is closed
         if 'scraper' in locals():
-            del scraper
+            scraper.close()
@@ -0,0 +1,270 @@
+from contextlib import contextmanager
+import pandas as pd
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+# Advisory file locks are only available on POSIX systems
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY,
+    item_name TEXT NOT NULL,
+    region TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    price REAL,
+    currency TEXT,
+    currency_symbol TEXT,
+    item_url TEXT,
+    asin TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_observations_item_time ON observations (item_name, region, observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_time ON observations (observed_at);
+
+-- Materialized latest observation per (item, region), maintained on every append
+CREATE TABLE IF NOT EXISTS latest_prices (
+    item_name TEXT NOT NULL,
+    region TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    price REAL,
+    currency TEXT,
+    currency_symbol TEXT,
+    item_url TEXT,
+    asin TEXT,
+    PRIMARY KEY (item_name, region)
+);
+"""
+
+UPSERT_LATEST = """
+INSERT INTO latest_prices (item_name, region, observed_at, status, price, currency, currency_symbol, item_url, asin)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (item_name, region) DO UPDATE SET
+    observed_at = excluded.observed_at,
+    status = excluded.status,
+    price = excluded.price,
+    currency = excluded.currency,
+    currency_symbol = excluded.currency_symbol,
+    item_url = excluded.item_url,
+    asin = excluded.asin
+WHERE excluded.observed_at >= latest_prices.observed_at
+"""
+
+
+def connect(db_path, timeout=30, journal_mode='WAL'):
+    # WAL lets the UI read while a scraper appends; busy timeout serializes concurrent writers.
+    # WAL needs shared memory on one host, files opened from several machines use journal_mode='DELETE'
+    connection = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False)
+    connection.execute(f"PRAGMA journal_mode={journal_mode}")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+# Placeholder prices written when an item could not be priced
+FAILED_PRICES = ["Error", "Not found"]
+
+
+# SQLite's default limit on bound parameters is 999, IN lists are split into batches below it
+BATCH_SIZE = 500
+
+
+class QueryResult(list):
+    # Fetched rows, plus the rowcount and lastrowid of the statement that produced them
+    def __init__(self, rows=(), rowcount=0, lastrowid=None):
+        super().__init__(rows)
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+
+
+def execute(db_path, query, params=(), journal_mode='WAL'):
+    # One statement in its own connection and transaction
+    connection = connect(db_path, journal_mode=journal_mode)
+    try:
+        with connection:
+            cursor = connection.execute(query, params)
+            return QueryResult(cursor.fetchall(), cursor.rowcount, cursor.lastrowid)
+    finally:
+        connection.close()
+
+
+def execute_in(db_path, query, values, params=(), journal_mode='WAL'):
+    # Runs query once per batch of values, with {placeholders} standing for the batch's IN list
+    # and params bound before it; rows and rowcounts of all batches are combined
+    combined = QueryResult()
+    values = list(values)
+    for start in range(0, len(values), BATCH_SIZE):
+        batch = values[start:start + BATCH_SIZE]
+        placeholders = ', '.join('?' * len(batch))
+        result = execute(db_path, query.format(placeholders=placeholders), (*params, *batch), journal_mode=journal_mode)
+        combined.extend(result)
+        combined.rowcount += result.rowcount
+    return combined
+
+
+def result_status(price):
+    if price == "Error":
+        return 'error'
+    if price == "Not found" or price is None or price == "":
+        return 'not_found'
+    return 'ok'
+
+
+class PriceHistory:
+    def __init__(self, db_path='price_history.db'):
+        self.db_path = db_path
+        connection = connect(self.db_path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def record_many(self, results, region, observed_at=None):
+        observed_at = observed_at or time.time()
+        rows = []
+        for result in results:
+            status = result_status(result['item_price'])
+            rows.append((
+                result['item_name'],
+                result.get('region', region),
+                result.get('observed_at', observed_at),
+                status,
+                float(result['item_price']) if status == 'ok' else None,
+                result.get('currency') or None,
+                result.get('currency_symbol') or None,
+                result.get('item_url') or None,
+                result.get('asin'),
+            ))
+        if not rows:
+            return 0
+
+        # One transaction per batch keeps appends cheap
+        connection = connect(self.db_path)
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT INTO observations (item_name, region, observed_at, status, price, currency, currency_symbol, item_url, asin) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                connection.executemany(UPSERT_LATEST, rows)
+        finally:
+            connection.close()
+        logging.debug(f"Recorded {len(rows)} price observations")
+        return len(rows)
+
+    def latest(self, region=None):
+        query = "SELECT * FROM latest_prices"
+        params = ()
+        if region:
+            query += " WHERE region = ?"
+            params = (region,)
+        connection = connect(self.db_path)
+        try:
+            return pd.read_sql_query(query, connection, params=params)
+        finally:
+            connection.close()
+
+    def history(self, item_name, region=None, since=None):
+        query = "SELECT * FROM observations WHERE item_name = ?"
+        params = [item_name]
+        if region:
+            query += " AND region = ?"
+            params.append(region)
+        if since:
+            query += " AND observed_at >= ?"
+            params.append(since)
+        query += " ORDER BY observed_at"
+        connection = connect(self.db_path)
+        try:
+            df = pd.read_sql_query(query, connection, params=params)
+        finally:
+            connection.close()
+        df['observed_at'] = pd.to_datetime(df['observed_at'], unit='s')
+        return df
+
+
+@contextmanager
+def catalog_lock(csv_file):
+    # Exclusive lock held across every read-modify-replace of a catalog CSV, so concurrent
+    # writers (scrape jobs, imports, the UI) apply their changes one after another
+    if fcntl is None:
+        yield
+        return
+    with open(f"{os.path.abspath(csv_file)}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def atomic_replace(csv_file):
+    # Yields a temporary file next to csv_file that replaces it in one step once the block succeeds,
+    # so readers never see a half-written file. It is removed again if the block fails
+    directory = os.path.dirname(os.path.abspath(csv_file))
+    fd, tmp_path = tempfile.mkstemp(prefix='.products-', suffix='.csv', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', newline='') as tmp_file:
+            yield tmp_file
+        os.replace(tmp_path, csv_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_csv_atomic(df, csv_file):
+    # The last writer replaces the file in one step.
+    # Callers that read the file first must hold catalog_lock for the whole update
+    with atomic_replace(csv_file) as tmp_file:
+        df.to_csv(tmp_file, index=False)
+
+
+def rewrite_csv(csv_file, transform, chunk_size=10000):
+    # Streams the current file through transform(chunk) -> chunk and replaces it, under the catalog lock
+    with catalog_lock(csv_file), atomic_replace(csv_file) as tmp_file:
+        # Read as text, so prices such as 2.00 are written back unchanged instead of as 2.0
+        header = True
+        for chunk in pd.read_csv(csv_file, chunksize=chunk_size, dtype=str, keep_default_na=False):
+            transform(chunk).to_csv(tmp_file, index=False, header=header)
+            header = False
+
+        # An empty catalog still keeps its header
+        if header:
+            pd.read_csv(csv_file, nrows=0).to_csv(tmp_file, index=False)
+
+
+def merge_results_into_csv(csv_file, results, chunk_size=10000,
+                           columns=('item_price', 'item_url', 'currency', 'currency_symbol')):
+    # results is either a list of results or a callable mapping item names to their results
+    if callable(results):
+        lookup = results
+    else:
+        by_name = {result['item_name']: result for result in results}
+        lookup = lambda names: {name: by_name[name] for name in names if name in by_name}
+
+    # Re-read the catalog chunk by chunk so rows added or removed during the scrape are kept
+    def merge(chunk):
+        found = lookup(chunk['item_name'].dropna().unique().tolist())
+        mask = chunk['item_name'].isin(found)
+        for column in columns:
+            if column not in chunk.columns:
+                chunk[column] = ""
+            chunk[column] = chunk[column].astype(object)
+            chunk.loc[mask, column] = chunk.loc[mask, 'item_name'].map(lambda name: found[name][column])
+        return chunk
+
+    rewrite_csv(csv_file, merge, chunk_size=chunk_size)
+
+
+def remove_items_from_csv(csv_file, item_names, chunk_size=10000):
+    # Drops rows from the file as it is now, not from a copy that may be out of date
+    item_names = set(item_names)
+    rewrite_csv(csv_file, lambda chunk: chunk[~chunk['item_name'].isin(item_names)], chunk_size=chunk_size)
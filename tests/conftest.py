@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import bench  # noqa: E402
+from fetcher import FetchResult  # noqa: E402
+
+
+class RecordingBrowser:
+    # Stands in for Chrome: records every fallback and returns an empty extraction
+    def __init__(self):
+        self.urls = []
+
+    def fetch(self, url, ready_selector=None, script=None, script_args=()):
+        self.urls.append(url)
+        page = FetchResult(url, 200, "", 'browser')
+        page.extracted = []
+        return page
+
+    def reset(self, user_agent):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope='session')
+def recorded_pages():
+    # The benchmark's server for the recordings in benchmarks/pages
+    server = bench.start_server(bench.load_manifest())
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def make_scraper(recorded_pages, tmp_path):
+    # Scrapers configured like the benchmark's, every store in the test's own directory
+    scrapers = []
+
+    def make(engine='http'):
+        scraper = bench.make_scraper(engine, recorded_pages.server_address[1], str(tmp_path))
+        if scraper.browser is not None:
+            scraper.browser = RecordingBrowser()
+        scrapers.append(scraper)
+        return scraper
+
+    yield make
+    for scraper in scrapers:
+        scraper.close()
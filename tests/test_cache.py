@@ -0,0 +1,44 @@
+import pytest
+
+import cache
+from cache import ResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    return now
+
+
+def result(item_name, price):
+    return {'item_name': item_name, 'item_price': price, 'item_url': '', 'currency': '', 'currency_symbol': ''}
+
+
+@pytest.mark.parametrize('price, ttl', [("149.99", 600), ("Not found", 60), ("Error", 10)])
+def test_entries_expire_after_their_ttl(tmp_path, clock, price, ttl):
+    results = ResultCache(str(tmp_path / 'cache.db'), ttl=600, not_found_ttl=60, error_ttl=10)
+    results.put(result('Kindle', price), 'US')
+
+    clock[0] += ttl - 1
+    assert results.get('Kindle', 'US')['item_price'] == price
+    clock[0] += 1
+    assert results.get('Kindle', 'US') is None
+
+
+def test_zero_ttl_is_not_stored(tmp_path, clock):
+    results = ResultCache(str(tmp_path / 'cache.db'), error_ttl=0)
+    results.put(result('Kindle', "Error"), 'US')
+    assert results.get('Kindle', 'US') is None
+    assert results.stats()['entries'] == 0
+
+
+def test_lookups_are_per_region_and_normalized(tmp_path, clock):
+    results = ResultCache(str(tmp_path / 'cache.db'))
+    results.put(result('Kindle Paperwhite', "149.99"), 'US')
+
+    cached = results.get('  kindle, paperwhite ', 'US')
+    assert cached['item_name'] == '  kindle, paperwhite '
+    assert cached['from_cache']
+    assert results.get('Kindle Paperwhite', 'UK') is None
+    assert (results.hits, results.misses) == (1, 1)
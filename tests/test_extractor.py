@@ -0,0 +1,56 @@
+import pytest
+
+from extractor import extract_candidates, parse_price
+from fetcher import FetchResult
+
+RESULT = """
+<div data-asin="{asin}" data-component-type="s-search-result" class="s-result-item">
+  <h2><a href="/item/dp/{asin}"><span>{title}</span></a></h2>
+  {price}
+</div>
+"""
+
+
+def search_page(*results):
+    html = "".join(RESULT.format(asin=asin, title=title, price=price) for asin, title, price in results)
+    return FetchResult('https://www.amazon.com/s?k=item', 200, f"<html><body>{html}</body></html>", 'http')
+
+
+def price_span(text):
+    return f'<span class="a-price"><span class="a-offscreen">{text}</span></span>'
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("$149.99", 149.99),
+    ("$1,049.95", 1049.95),
+    ("1.149,99 €", 1149.99),
+    ("1 299,00 €", 1299.00),
+    ("£59.99", 59.99),
+    ("¥12,800", 12800.0),
+    ("Currently unavailable.", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_price(text, expected):
+    assert parse_price(text) == expected
+
+
+def test_candidates_keep_the_page_order():
+    page = search_page(
+        ('B000000001', "Kindle", price_span("$149.99")),
+        ('B000000002', "Kindle case", price_span("€29,99")),
+    )
+    candidates = extract_candidates(page, 'https://www.amazon.com/s?k=')
+    assert [candidate['asin'] for candidate in candidates] == ['B000000001', 'B000000002']
+    assert candidates[0]['url'] == 'https://www.amazon.com/item/dp/B000000001'
+    assert (candidates[1]['price'], candidates[1]['currency']) == (29.99, 'EUR')
+
+
+def test_only_the_first_result_is_matched(make_scraper, monkeypatch):
+    scraper = make_scraper('http')
+    page = search_page(
+        ('B000000001', "Discontinued gadget", ""),
+        ('B000000002', "Gadget case", price_span("$9.99")),
+    )
+    monkeypatch.setattr(scraper, 'fetch_checked', lambda url, **options: page)
+    assert scraper.search_item('discontinued gadget', 'US')['item_price'] == "Not found"
@@ -0,0 +1,69 @@
+import bench
+from extractor import PRODUCT_READY_SELECTOR
+
+
+def test_http_search(make_scraper):
+    scraper = make_scraper('http')
+    result = scraper.scrape_item('kindle paperwhite', 'US')
+    assert result['item_price'] == '149.99'
+    assert result['currency'] == 'USD'
+    assert result['asin'] == 'B0BENCH001'
+
+
+def test_auto_falls_back_when_the_page_is_not_ready(make_scraper):
+    scraper = make_scraper('auto')
+    product_url = scraper.base_urls['US'].replace('/s?k=', '/dp/B0BENCH001')
+
+    # A product page never has search results
+    page = scraper.fetch_page(product_url, region='US')
+    assert page.engine == 'browser'
+    assert scraper.browser.urls == [product_url]
+
+    page = scraper.fetch_page(product_url, ready_selector=PRODUCT_READY_SELECTOR, region='US')
+    assert page.engine == 'http'
+    assert scraper.browser.urls == [product_url]
+
+
+def test_auto_does_not_fall_back_for_a_missing_page(make_scraper):
+    scraper = make_scraper('auto')
+    result = scraper.scrape_item('no such recording', 'US')
+    assert result['item_price'] == "Not found"
+    assert scraper.browser.urls == []
+
+
+def test_auto_reports_a_captcha_without_chrome(make_scraper):
+    scraper = make_scraper('auto')
+    result = scraper.scrape_item('robot check', 'US')
+    assert result['blocked']
+    assert result['item_price'] == "Error"
+    assert scraper.browser.urls == []
+
+
+def test_open_circuit_skips_the_network(make_scraper):
+    scraper = make_scraper('http')
+    for _ in range(scraper.breaker.threshold):
+        scraper.breaker.record_block('US')
+    result = scraper.scrape_item('kindle paperwhite', 'US')
+    assert result['blocked'] and result['circuit_open']
+    assert scraper.breaker.reopens_in('US') > 0
+
+
+def test_refresh_uses_the_product_page(make_scraper):
+    scraper = make_scraper('http')
+    scraper.scrape_item('fire tv stick', 'UK')
+    scraper.metrics.reset()
+
+    result = scraper.scrape_item('fire tv stick', 'UK')
+    assert result['item_price'] == '59.99'
+    assert result['item_url'].endswith('/UK/dp/B0BENCH006')
+    assert bench.refresh_outcomes(scraper) == {'ok': 1}
+
+
+def test_gone_product_is_resolved_through_search(make_scraper):
+    scraper = make_scraper('http')
+    scraper.asin_index.put('kindle paperwhite', 'US', 'B0GONE0000', None)
+
+    result = scraper.scrape_item('kindle paperwhite', 'US')
+    assert result['item_price'] == '149.99'
+    assert scraper.asin_index.get('kindle paperwhite', 'US')['asin'] == 'B0BENCH001'
+    assert bench.refresh_outcomes(scraper) == {'gone': 1}
@@ -0,0 +1,56 @@
+import pandas as pd
+import requests
+
+from journal import RunJournal
+
+
+def write_catalog(path, names):
+    pd.DataFrame({'item_name': names, 'item_price': '', 'currency': '', 'currency_symbol': '', 'item_url': ''}).to_csv(path, index=False)
+
+
+def result(item_name, price):
+    return {'item_name': item_name, 'item_price': price, 'item_url': '', 'currency': '', 'currency_symbol': ''}
+
+
+def test_failed_items_are_not_finished(tmp_path):
+    journal = RunJournal(str(tmp_path / 'runs.db'))
+    run_id = journal.start_run('products.csv', 'US')
+    journal.record(run_id, result('Kindle', "149.99"))
+    journal.record(run_id, result('Echo', "Not found"))
+    journal.record(run_id, result('Fire TV', "Error"))
+
+    assert journal.finished_items(run_id, ['Kindle', 'Echo', 'Fire TV']) == {'Kindle', 'Echo'}
+    assert journal.failed_count(run_id) == 1
+    assert journal.find_unfinished('products.csv', 'US') == run_id
+
+
+def test_resume_retries_only_failed_items(make_scraper, tmp_path, monkeypatch):
+    scraper = make_scraper('http')
+    scraper.journal_db = str(tmp_path / 'runs.db')
+    write_catalog(scraper.csv_file, ['kindle paperwhite', 'discontinued gadget', 'echo dot'])
+
+    fetch = scraper.http.fetch
+    fetched = []
+
+    def flaky_fetch(url):
+        fetched.append(url)
+        if 'echo' in url:
+            raise requests.ConnectionError("connection reset")
+        return fetch(url)
+
+    monkeypatch.setattr(scraper.http, 'fetch', flaky_fetch)
+    run_id = scraper.run_streaming()
+    journal = RunJournal(scraper.journal_db)
+    assert journal.failed_count(run_id) == 1
+    assert journal.find_unfinished(scraper.csv_file, 'US') == run_id
+
+    fetched.clear()
+    monkeypatch.setattr(scraper.http, 'fetch', lambda url: fetched.append(url) or fetch(url))
+    assert scraper.run_streaming(resume=True) == run_id
+    assert len(fetched) == 1 and 'echo' in fetched[0]
+    assert journal.find_unfinished(scraper.csv_file, 'US') is None
+
+    catalog = pd.read_csv(scraper.csv_file, dtype=str, keep_default_na=False).set_index('item_name')
+    assert catalog['item_price'].to_dict() == {
+        'kindle paperwhite': '149.99', 'discontinued gadget': "Not found", 'echo dot': '1049.95',
+    }
@@ -0,0 +1,63 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from importer import import_items
+from storage import atomic_replace, merge_results_into_csv, remove_items_from_csv
+
+
+def read_catalog(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def test_concurrent_imports_and_merges_are_not_lost(tmp_path):
+    csv_file = str(tmp_path / 'products.csv')
+    import_items([[f"item {index}" for index in range(50)]], csv_file)
+
+    def merge(start):
+        for index in range(start, 50, 5):
+            merge_results_into_csv(csv_file, [{
+                'item_name': f"item {index}", 'item_price': f"{index}.00",
+                'item_url': '', 'currency': 'USD', 'currency_symbol': '$',
+            }])
+
+    def add(start):
+        for index in range(start, start + 10):
+            import_items([[f"new item {index}"]], csv_file)
+
+    threads = [threading.Thread(target=merge, args=(start,)) for start in range(5)]
+    threads += [threading.Thread(target=add, args=(start,)) for start in (0, 10, 20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    catalog = read_catalog(csv_file).set_index('item_name')
+    assert len(catalog) == 80
+    assert all(catalog.loc[f"item {index}", 'item_price'] == f"{index}.00" for index in range(50))
+    assert all(f"new item {index}" in catalog.index for index in range(30))
+
+
+def test_import_skips_duplicates(tmp_path):
+    csv_file = str(tmp_path / 'products.csv')
+    assert import_items([["Kindle", " kindle "], ["", "Echo"]], csv_file) == {
+        'read': 4, 'added': 2, 'duplicates': 1, 'empty': 1,
+    }
+    remove_items_from_csv(csv_file, ["Kindle"])
+    assert read_catalog(csv_file)['item_name'].tolist() == ["Echo"]
+
+
+def test_failed_replace_keeps_the_catalog(tmp_path):
+    csv_file = str(tmp_path / 'products.csv')
+    import_items([["Kindle"]], csv_file)
+    before = open(csv_file).read()
+
+    with pytest.raises(ValueError):
+        with atomic_replace(csv_file) as tmp_file:
+            tmp_file.write("partial")
+            raise ValueError("interrupted")
+
+    assert open(csv_file).read() == before
+    assert sorted(os.listdir(tmp_path)) == ['products.csv', 'products.csv.lock']
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from blocking import CircuitBreaker
+from workqueue import QueueWorker, RedisWorkQueue, WorkQueue
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_queue(request, tmp_path):
+    def make(**options):
+        if request.param == 'sqlite':
+            return WorkQueue(str(tmp_path / 'work_queue.db'), **options)
+        fakeredis = pytest.importorskip('fakeredis')
+        return RedisWorkQueue(client=fakeredis.FakeRedis(decode_responses=True), **options)
+    return make
+
+
+def test_lease_complete_and_results(make_queue):
+    queue = make_queue()
+    assert queue.enqueue([('Kindle', 'US'), ('Kindle', 'UK'), ('Echo', 'US')]) == 3
+
+    tasks = queue.lease('worker-1', limit=2)
+    assert len(tasks) == 2
+    assert len(queue.lease('worker-2', limit=10)) == 1
+    assert queue.lease('worker-2', limit=10) == []
+
+    task_id, item_name, region = tasks[0]
+    result = {'item_name': item_name, 'region': region, 'item_price': '149.99'}
+    assert not queue.complete(task_id, 'worker-2', result)
+    assert queue.complete(task_id, 'worker-1', result)
+    assert queue.results([item_name], region)[item_name]['item_price'] == '149.99'
+    assert queue.stats()['done'] == 1
+
+
+def test_expired_leases_are_retried_then_dead_lettered(make_queue):
+    queue = make_queue(visibility_timeout=0.5, max_attempts=2)
+    queue.enqueue([('Kindle', 'US')])
+
+    assert len(queue.lease('worker-1')) == 1
+    time.sleep(0.6)
+    (task_id, _, _), = queue.lease('worker-2')
+    assert not queue.heartbeat([task_id], 'worker-1')
+    assert queue.heartbeat([task_id], 'worker-2')
+
+    time.sleep(0.6)
+    assert queue.lease('worker-3') == []
+    assert queue.stats()['dead'] == 1
+    assert queue.requeue_dead() == 1
+    assert len(queue.lease('worker-3')) == 1
+
+
+def test_failures_use_up_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.enqueue([('Kindle', 'US')])
+
+    (task_id, _, _), = queue.lease('worker-1')
+    assert queue.fail(task_id, 'worker-1', 'scrape error', retry_delay=0)
+    (task_id, _, _), = queue.lease('worker-1')
+    assert queue.fail(task_id, 'worker-1', 'scrape error', retry_delay=0)
+    assert queue.stats()['dead'] == 1
+
+
+def test_release_does_not_use_an_attempt(make_queue):
+    queue = make_queue(max_attempts=1)
+    queue.enqueue([('Kindle', 'US')])
+
+    for delay in (0, 0, 60):
+        (task_id, _, _), = queue.lease('worker-1')
+        queue.release([task_id], 'worker-1', delay=delay)
+    assert queue.lease('worker-1') == []
+    assert queue.stats()['dead'] == 0
+
+
+class CircuitOpenScraper:
+    # Every item is skipped the way scrape_item skips it while the region's circuit is open
+    def __init__(self):
+        self.breaker = CircuitBreaker(threshold=1, cooldown=300)
+        self.breaker.record_block('US')
+
+    def record_history(self, *results):
+        pass
+
+    def scrape_items(self, items, on_result=None, pool=None, cancel_event=None):
+        for item_name, region in items:
+            on_result({'item_name': item_name, 'region': region, 'item_price': "Error", 'blocked': True, 'circuit_open': True})
+
+
+def test_open_circuit_does_not_dead_letter_tasks(make_queue):
+    queue = make_queue(max_attempts=1)
+    queue.enqueue([('Kindle', 'US'), ('Echo', 'US')])
+    worker = QueueWorker(queue, CircuitOpenScraper(), worker_id='worker-1')
+
+    assert worker.process(queue.lease('worker-1')) == 2
+    assert queue.lease('worker-1') == []
+    assert queue.stats() == {'pending': 2, 'leased': 0, 'done': 0, 'dead': 0}
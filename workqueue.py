@@ -0,0 +1,564 @@
+import argparse
+import pandas as pd
+from scraper import ENGINES, AmazonScraper, interleave_regions, to_wide
+from storage import BATCH_SIZE, connect, execute, execute_in, merge_results_into_csv, write_csv_atomic
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+# The Redis backend is optional, only queues shared by several machines need it
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Seconds a leased task stays invisible to other workers unless its lease is extended
+VISIBILITY_TIMEOUT = 300
+MAX_ATTEMPTS = 3
+
+# Seconds before a failed or blocked task becomes available again
+RETRY_DELAY = 60
+
+# The queue file is shared by processes on several machines, and WAL only works on one host.
+# A rollback journal relies on the file system's POSIX locks instead, see the README for NFS
+JOURNAL_MODE = 'DELETE'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY,
+    item_name TEXT NOT NULL,
+    region TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (item_name, region)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_available ON tasks (status, available_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks (status, lease_expires);
+"""
+
+
+class WorkQueue:
+    def __init__(self, db_path='work_queue.db', visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        # Every coordinator and worker process opens the same file, e.g. on a shared volume
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        connection = connect(self.db_path, journal_mode=JOURNAL_MODE)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def enqueue(self, tasks):
+        # Re-enqueueing a finished or dead task makes it pending again; pending and leased tasks are left alone
+        now = time.time()
+        rows = [(item_name, region, now, now) for item_name, region in tasks]
+        connection = connect(self.db_path, journal_mode=JOURNAL_MODE)
+        try:
+            with connection:
+                before = connection.total_changes
+                connection.executemany(
+                    "INSERT INTO tasks (item_name, region, status, available_at, updated_at) VALUES (?, ?, 'pending', ?, ?) "
+                    "ON CONFLICT (item_name, region) DO UPDATE SET status = 'pending', attempts = 0, "
+                    "available_at = excluded.available_at, lease_owner = NULL, lease_expires = NULL, "
+                    "last_error = NULL, updated_at = excluded.updated_at "
+                    "WHERE tasks.status IN ('done', 'dead')",
+                    rows
+                )
+                return connection.total_changes - before
+        finally:
+            connection.close()
+
+    def lease(self, worker_id, limit=10):
+        # Claims available tasks and tasks whose lease ran out, atomically across processes
+        connection = connect(self.db_path, journal_mode=JOURNAL_MODE)
+        connection.isolation_level = None
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+
+            # A task whose last allowed attempt was lost with its worker is dead, not retried forever
+            connection.execute(
+                "UPDATE tasks SET status = 'dead', last_error = 'lease expired', lease_owner = NULL, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            rows = connection.execute(
+                "SELECT task_id, item_name, region FROM tasks "
+                "WHERE (status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY task_id LIMIT ?",
+                (now, now, limit)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE task_id = ?",
+                [(worker_id, now + self.visibility_timeout, now, row[0]) for row in rows]
+            )
+            connection.execute("COMMIT")
+            return rows
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def heartbeat(self, task_ids, worker_id):
+        # Extends the leases this worker still holds; a lease that was taken over is not extended
+        now = time.time()
+        return execute_in(
+            self.db_path,
+            "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+            "WHERE status = 'leased' AND lease_owner = ? AND task_id IN ({placeholders})",
+            task_ids, (now + self.visibility_timeout, now, worker_id),
+            journal_mode=JOURNAL_MODE
+        ).rowcount
+
+    def complete(self, task_id, worker_id, result):
+        stored = {key: value for key, value in result.items() if key != 'from_cache'}
+        return execute(
+            self.db_path,
+            "UPDATE tasks SET status = 'done', result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE task_id = ? AND status = 'leased' AND lease_owner = ?",
+            (json.dumps(stored), time.time(), task_id, worker_id),
+            journal_mode=JOURNAL_MODE
+        ).rowcount > 0
+
+    def fail(self, task_id, worker_id, error, retry_delay=RETRY_DELAY):
+        # Back to pending after a delay, or dead once the attempts are used up
+        now = time.time()
+        return execute(
+            self.db_path,
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END, "
+            "available_at = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE task_id = ? AND status = 'leased' AND lease_owner = ?",
+            (self.max_attempts, now + retry_delay, error, now, task_id, worker_id),
+            journal_mode=JOURNAL_MODE
+        ).rowcount > 0
+
+    def release(self, task_ids, worker_id, delay=0):
+        # Hands tasks that were never really tried back without using up an attempt
+        now = time.time()
+        execute_in(
+            self.db_path,
+            "UPDATE tasks SET status = 'pending', attempts = MAX(attempts - 1, 0), available_at = ?, "
+            "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = 'leased' AND lease_owner = ? AND task_id IN ({placeholders})",
+            task_ids, (now + delay, now, worker_id),
+            journal_mode=JOURNAL_MODE
+        )
+
+    def requeue_dead(self):
+        return execute(
+            self.db_path,
+            "UPDATE tasks SET status = 'pending', attempts = 0, available_at = ?, updated_at = ? WHERE status = 'dead'",
+            (time.time(), time.time()),
+            journal_mode=JOURNAL_MODE
+        ).rowcount
+
+    def stats(self):
+        rows = execute(self.db_path, "SELECT status, COUNT(*) FROM tasks GROUP BY status", journal_mode=JOURNAL_MODE)
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'dead': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def unfinished(self):
+        counts = self.stats()
+        return counts['pending'] + counts['leased']
+
+    def results(self, item_names, region):
+        rows = execute_in(
+            self.db_path,
+            "SELECT item_name, result FROM tasks WHERE status = 'done' AND region = ? AND item_name IN ({placeholders})",
+            item_names, (region,),
+            journal_mode=JOURNAL_MODE
+        )
+        return {item_name: json.loads(result) for item_name, result in rows}
+
+
+# Shared by the Redis scripts: server time, so the clocks of the worker machines do not matter,
+# and the queue's keys, which all start with the prefix passed as ARGV[1]
+REDIS_PRELUDE = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local prefix = ARGV[1]
+local pending, leased, done, dead = prefix .. ':pending', prefix .. ':leased', prefix .. ':done', prefix .. ':dead'
+local function task_key(task_id) return prefix .. ':task:' .. task_id end
+local function holds_lease(task, owner)
+    local status, lease_owner = unpack(redis.call('HMGET', task, 'status', 'lease_owner'))
+    return status == 'leased' and lease_owner == owner
+end
+"""
+
+# Arguments: prefix, then item name and region of every task
+REDIS_ENQUEUE = REDIS_PRELUDE + """
+local added = 0
+for index = 2, #ARGV, 2 do
+    local item_name, region = ARGV[index], ARGV[index + 1]
+    local task_id = redis.call('HGET', prefix .. ':ids', region .. '|' .. item_name)
+    local status = task_id and redis.call('HGET', task_key(task_id), 'status')
+    if not task_id then
+        task_id = redis.call('INCR', prefix .. ':next_id')
+        redis.call('HSET', prefix .. ':ids', region .. '|' .. item_name, task_id)
+    end
+    if not status or status == 'done' or status == 'dead' then
+        redis.call('HSET', task_key(task_id), 'item_name', item_name, 'region', region, 'status', 'pending',
+                   'attempts', 0, 'lease_owner', '', 'last_error', '', 'updated_at', now)
+        redis.call('SREM', done, task_id)
+        redis.call('SREM', dead, task_id)
+        redis.call('HDEL', prefix .. ':results:' .. region, item_name)
+        redis.call('ZADD', pending, now, task_id)
+        added = added + 1
+    end
+end
+return added
+"""
+
+# Arguments: prefix, worker id, limit, visibility timeout, max attempts
+REDIS_LEASE = REDIS_PRELUDE + """
+local owner, limit, timeout, max_attempts = ARGV[2], tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+
+-- Expired leases are available again, or dead once their last allowed attempt was lost with its worker
+for _, task_id in ipairs(redis.call('ZRANGEBYSCORE', leased, '-inf', '(' .. now)) do
+    local task = task_key(task_id)
+    redis.call('ZREM', leased, task_id)
+    if tonumber(redis.call('HGET', task, 'attempts')) >= max_attempts then
+        redis.call('HSET', task, 'status', 'dead', 'last_error', 'lease expired', 'lease_owner', '', 'updated_at', now)
+        redis.call('SADD', dead, task_id)
+    else
+        redis.call('HSET', task, 'status', 'pending', 'lease_owner', '')
+        redis.call('ZADD', pending, now, task_id)
+    end
+end
+
+local tasks = {}
+for _, task_id in ipairs(redis.call('ZRANGEBYSCORE', pending, '-inf', now, 'LIMIT', 0, limit)) do
+    local task = task_key(task_id)
+    redis.call('ZREM', pending, task_id)
+    redis.call('ZADD', leased, now + timeout, task_id)
+    redis.call('HINCRBY', task, 'attempts', 1)
+    redis.call('HSET', task, 'status', 'leased', 'lease_owner', owner, 'updated_at', now)
+    local item_name, region = unpack(redis.call('HMGET', task, 'item_name', 'region'))
+    table.insert(tasks, {tonumber(task_id), item_name, region})
+end
+return tasks
+"""
+
+# Arguments: prefix, worker id, visibility timeout, then task ids
+REDIS_HEARTBEAT = REDIS_PRELUDE + """
+local extended = 0
+for index = 4, #ARGV do
+    if holds_lease(task_key(ARGV[index]), ARGV[2]) then
+        redis.call('ZADD', leased, now + tonumber(ARGV[3]), ARGV[index])
+        redis.call('HSET', task_key(ARGV[index]), 'updated_at', now)
+        extended = extended + 1
+    end
+end
+return extended
+"""
+
+# Arguments: prefix, worker id, task id, result as JSON
+REDIS_COMPLETE = REDIS_PRELUDE + """
+local task = task_key(ARGV[3])
+if not holds_lease(task, ARGV[2]) then
+    return 0
+end
+redis.call('ZREM', leased, ARGV[3])
+redis.call('SADD', done, ARGV[3])
+redis.call('HSET', task, 'status', 'done', 'result', ARGV[4], 'lease_owner', '', 'updated_at', now)
+local item_name, region = unpack(redis.call('HMGET', task, 'item_name', 'region'))
+redis.call('HSET', prefix .. ':results:' .. region, item_name, ARGV[4])
+return 1
+"""
+
+# Arguments: prefix, worker id, task id, error, retry delay, max attempts
+REDIS_FAIL = REDIS_PRELUDE + """
+local task = task_key(ARGV[3])
+if not holds_lease(task, ARGV[2]) then
+    return 0
+end
+redis.call('ZREM', leased, ARGV[3])
+redis.call('HSET', task, 'last_error', ARGV[4], 'lease_owner', '', 'updated_at', now)
+if tonumber(redis.call('HGET', task, 'attempts')) >= tonumber(ARGV[6]) then
+    redis.call('HSET', task, 'status', 'dead')
+    redis.call('SADD', dead, ARGV[3])
+else
+    redis.call('HSET', task, 'status', 'pending')
+    redis.call('ZADD', pending, now + tonumber(ARGV[5]), ARGV[3])
+end
+return 1
+"""
+
+# Arguments: prefix, worker id, delay, then task ids
+REDIS_RELEASE = REDIS_PRELUDE + """
+for index = 4, #ARGV do
+    local task = task_key(ARGV[index])
+    if holds_lease(task, ARGV[2]) then
+        local attempts = tonumber(redis.call('HGET', task, 'attempts'))
+        redis.call('ZREM', leased, ARGV[index])
+        redis.call('ZADD', pending, now + tonumber(ARGV[3]), ARGV[index])
+        redis.call('HSET', task, 'status', 'pending', 'attempts', math.max(attempts - 1, 0), 'lease_owner', '',
+                   'updated_at', now)
+    end
+end
+return 0
+"""
+
+# Arguments: prefix
+REDIS_REQUEUE_DEAD = REDIS_PRELUDE + """
+local task_ids = redis.call('SMEMBERS', dead)
+for _, task_id in ipairs(task_ids) do
+    redis.call('HSET', task_key(task_id), 'status', 'pending', 'attempts', 0, 'updated_at', now)
+    redis.call('ZADD', pending, now, task_id)
+end
+redis.call('DEL', dead)
+return #task_ids
+"""
+
+
+class RedisWorkQueue:
+    # Same interface as WorkQueue, for workers on several machines. Every state change is one Lua
+    # script, so leases are atomic across clients; all keys live on one Redis server, not a cluster.
+    # client can be any Redis-compatible client, e.g. fakeredis in tests
+    def __init__(self, url='redis://localhost:6379/0', prefix='work_queue', visibility_timeout=VISIBILITY_TIMEOUT,
+                 max_attempts=MAX_ATTEMPTS, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("The Redis work queue needs the redis package: pip install redis")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._enqueue = client.register_script(REDIS_ENQUEUE)
+        self._lease = client.register_script(REDIS_LEASE)
+        self._heartbeat = client.register_script(REDIS_HEARTBEAT)
+        self._complete = client.register_script(REDIS_COMPLETE)
+        self._fail = client.register_script(REDIS_FAIL)
+        self._release = client.register_script(REDIS_RELEASE)
+        self._requeue_dead = client.register_script(REDIS_REQUEUE_DEAD)
+
+    def _batched(self, script, values, *args):
+        # Long argument lists are split like SQLite IN lists, so no single script blocks the server for long
+        total = 0
+        values = list(values)
+        for start in range(0, len(values), BATCH_SIZE):
+            total += script(args=[self.prefix, *args, *values[start:start + BATCH_SIZE]])
+        return total
+
+    def enqueue(self, tasks):
+        pairs = [value for item_name, region in tasks for value in (item_name, region)]
+        return self._batched(self._enqueue, pairs)
+
+    def lease(self, worker_id, limit=10):
+        rows = self._lease(args=[self.prefix, worker_id, limit, self.visibility_timeout, self.max_attempts])
+        return [(int(task_id), item_name, region) for task_id, item_name, region in rows]
+
+    def heartbeat(self, task_ids, worker_id):
+        return self._batched(self._heartbeat, task_ids, worker_id, self.visibility_timeout)
+
+    def complete(self, task_id, worker_id, result):
+        stored = {key: value for key, value in result.items() if key != 'from_cache'}
+        return self._complete(args=[self.prefix, worker_id, task_id, json.dumps(stored)]) == 1
+
+    def fail(self, task_id, worker_id, error, retry_delay=RETRY_DELAY):
+        return self._fail(args=[self.prefix, worker_id, task_id, error, retry_delay, self.max_attempts]) == 1
+
+    def release(self, task_ids, worker_id, delay=0):
+        self._batched(self._release, task_ids, worker_id, delay)
+
+    def requeue_dead(self):
+        return self._requeue_dead(args=[self.prefix])
+
+    def stats(self):
+        with self.client.pipeline() as pipeline:
+            pipeline.zcard(f"{self.prefix}:pending")
+            pipeline.zcard(f"{self.prefix}:leased")
+            pipeline.scard(f"{self.prefix}:done")
+            pipeline.scard(f"{self.prefix}:dead")
+            pending, leased, done, dead = pipeline.execute()
+        return {'pending': pending, 'leased': leased, 'done': done, 'dead': dead}
+
+    def unfinished(self):
+        counts = self.stats()
+        return counts['pending'] + counts['leased']
+
+    def results(self, item_names, region):
+        found = {}
+        item_names = list(item_names)
+        for start in range(0, len(item_names), BATCH_SIZE):
+            batch = item_names[start:start + BATCH_SIZE]
+            stored = self.client.hmget(f"{self.prefix}:results:{region}", batch)
+            found.update({item_name: json.loads(result) for item_name, result in zip(batch, stored) if result is not None})
+        return found
+
+def enqueue_catalog(queue, csv_file, regions, chunk_size=10000):
+    # Coordinator side: stream the catalog into (item, region) tasks
+    added = 0
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_size):
+        names = chunk['item_name'].dropna().unique().tolist()
+        added += queue.enqueue(interleave_regions(names, regions))
+    logging.info(f"Enqueued {added} tasks from {csv_file} for {', '.join(regions)}")
+    return added
+
+
+def collect_results(queue, csv_file, region):
+    # Writes finished prices for one region back into the catalog
+    merge_results_into_csv(csv_file, lambda names: queue.results(names, region))
+    logging.info(f"Merged {region} results from the queue into {csv_file}")
+
+
+def collect_regions(queue, csv_file, regions, output_file, wide_output=None, chunk_size=10000):
+    # The catalog has one set of price columns, so several regions are written in the same
+    # long format as scrape_regions: one row per (item, region), plus an optional wide file
+    columns = ['item_name', 'region', 'item_price', 'currency', 'currency_symbol', 'item_url']
+    header = True
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_size):
+        names = chunk['item_name'].dropna().unique().tolist()
+        found = {region: queue.results(names, region) for region in regions}
+        rows = [
+            dict(found[region][name], item_name=name, region=region)
+            for name in names for region in regions if name in found[region]
+        ]
+        pd.DataFrame(rows, columns=columns).to_csv(
+            output_file, mode='w' if header else 'a', header=header, index=False
+        )
+        header = False
+
+    if wide_output:
+        write_csv_atomic(to_wide(pd.read_csv(output_file)), wide_output)
+    logging.info(f"Collected {', '.join(regions)} results from the queue into {output_file}")
+
+
+class QueueWorker:
+    def __init__(self, queue, scraper, workers=1, batch_size=None, worker_id=None, poll_interval=5):
+        self.queue = queue
+        self.scraper = scraper
+        self.workers = workers
+        self.batch_size = batch_size or max(1, workers * 2)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+
+    def _keep_alive(self, task_ids, done_event):
+        # Heartbeat well inside the visibility timeout while the batch is being scraped
+        interval = max(1, self.queue.visibility_timeout / 3)
+        while not done_event.wait(interval):
+            self.queue.heartbeat(task_ids, self.worker_id)
+
+    def process(self, tasks, pool=None):
+        by_key = {(item_name, region): task_id for task_id, item_name, region in tasks}
+        finished = set()
+
+        def on_result(result):
+            task_id = by_key[(result['item_name'], result['region'])]
+            finished.add(task_id)
+            self.scraper.record_history(result)
+            # Items skipped by an open circuit were never tried, they wait for it to close instead
+            reopens_in = self.scraper.breaker.reopens_in(result['region'])
+            if result.get('circuit_open'):
+                self.queue.release([task_id], self.worker_id, delay=reopens_in)
+            elif result.get('blocked'):
+                self.queue.fail(task_id, self.worker_id, 'blocked', retry_delay=max(RETRY_DELAY, reopens_in))
+            elif result['item_price'] == "Error":
+                self.queue.fail(task_id, self.worker_id, 'scrape error')
+            else:
+                self.queue.complete(task_id, self.worker_id, result)
+
+        done_event = threading.Event()
+        heartbeat = threading.Thread(target=self._keep_alive, args=(list(by_key.values()), done_event), daemon=True)
+        heartbeat.start()
+        try:
+            self.scraper.scrape_items(list(by_key), on_result=on_result, pool=pool, cancel_event=self.stop_event)
+        finally:
+            done_event.set()
+            unstarted = [task_id for task_id in by_key.values() if task_id not in finished]
+            if unstarted:
+                self.queue.release(unstarted, self.worker_id)
+        return len(finished)
+
+    def run(self, until_empty=False):
+        # One pool serves every batch so its browser sessions stay warm
+        pool = self.scraper.make_pool(self.workers) if self.workers > 1 else None
+        processed = 0
+        try:
+            while not self.stop_event.is_set():
+                tasks = self.queue.lease(self.worker_id, limit=self.batch_size)
+                if not tasks:
+                    if until_empty and not self.queue.unfinished():
+                        break
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                processed += self.process(tasks, pool=pool)
+                logging.info(f"Worker {self.worker_id} processed {processed} tasks")
+        finally:
+            if pool is not None:
+                pool.close()
+        return processed
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distribute scraping over workers through a shared task queue")
+    parser.add_argument('command', choices=('enqueue', 'work', 'collect', 'status', 'requeue-dead'))
+    parser.add_argument('csv_file', nargs='?', default="products.csv", help="CSV file with an item_name column")
+    parser.add_argument('--queue-db', default='work_queue.db', help="SQLite file shared by the coordinator and workers")
+    parser.add_argument('--redis-url', help="Use a Redis queue instead of SQLite, e.g. redis://queue-host:6379/0")
+    parser.add_argument('--regions', default='US', help="Comma-separated regions to enqueue or collect")
+    parser.add_argument('--output', default="prices_by_region.csv", help="Long-format output when collecting several regions")
+    parser.add_argument('--wide-output', help="Optional one-row-per-item output when collecting several regions")
+    parser.add_argument('--engine', default='auto', choices=ENGINES, help="Page fetch engine")
+    parser.add_argument('--workers', type=int, default=1, help="Concurrent scraper sessions in this worker process")
+    parser.add_argument('--history-db', default='price_history.db', help="Shared price history the workers write to")
+    parser.add_argument('--visibility-timeout', type=int, default=VISIBILITY_TIMEOUT, help="Seconds before an unextended lease expires")
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help="Attempts before a task is dead-lettered")
+    parser.add_argument('--until-empty', action='store_true', help="Exit once the queue has no unfinished tasks")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.redis_url:
+        queue = RedisWorkQueue(args.redis_url, visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts)
+    else:
+        queue = WorkQueue(args.queue_db, visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts)
+    regions = [region.strip().upper() for region in args.regions.split(',') if region.strip()]
+
+    if args.command == 'enqueue':
+        if not os.path.exists(args.csv_file):
+            logging.error(f"CSV file not found: {args.csv_file}")
+            sys.exit(1)
+        enqueue_catalog(queue, args.csv_file, regions)
+    elif args.command == 'collect':
+        if len(regions) == 1:
+            collect_results(queue, args.csv_file, regions[0])
+        else:
+            collect_regions(queue, args.csv_file, regions, args.output, wide_output=args.wide_output)
+    elif args.command == 'requeue-dead':
+        logging.info(f"Requeued {queue.requeue_dead()} dead tasks")
+    elif args.command == 'work':
+        # Workers never touch the CSV; the coordinator collects results from the queue
+        scraper = AmazonScraper(
+            args.csv_file, region=regions[0], engine=args.engine, history_db=args.history_db, journal_db=None
+        )
+        worker = QueueWorker(queue, scraper, workers=args.workers)
+        try:
+            worker.run(until_empty=args.until_empty)
+        except KeyboardInterrupt:
+            worker.stop()
+            logging.info("Worker stopped")
+        finally:
+            scraper.close()
+    logging.info(f"Queue status: {queue.stats()}")